@@ -1,33 +1,82 @@
 from flask import Flask, render_template
 from flask_sqlalchemy import SQLAlchemy
-from flask_bootstrap import Bootstrap
 from flask_wtf.csrf import CSRFProtect
-from datetime import datetime
+from datetime import datetime, timedelta
 
 db = SQLAlchemy()
-bootstrap = Bootstrap()
 csrf = CSRFProtect()
 
 def create_app(config_class='config.Config'):
-    app = Flask(__name__)
+    from app.startup import StartupTimer
+    timer = StartupTimer()
+    # static/ sits next to the package, not inside it
+    app = Flask(__name__, static_folder='../static')
     app.config.from_object(config_class)
+    # API-only workers never render pages, so skip the page-only setup
+    pages = app.config['APP_ROLE'] != 'api'
+    timer.mark('config')
     
     
     db.init_app(app)
-    bootstrap.init_app(app)
+    from app import storage
+    storage.init_app(app)
+    from app import metrics
+    metrics.init_app(app)
+    from app import diagnostics
+    diagnostics.init_app(app)
+    timer.mark('database')
+    if pages:
+        from flask_bootstrap import Bootstrap
+        Bootstrap(app)
     csrf.init_app(app)
     
 
     @app.context_processor
     def inject_now():
         return {'current_year': datetime.utcnow().year}
+    timer.mark('extensions')
     
    
     from app.routes import main_bp
     app.register_blueprint(main_bp)
     
+    from app.cli import tasks_cli
+    app.cli.add_command(tasks_cli)
+    timer.mark('routes')
     
+    from app.cache import fragment_cache, json_cache
+    json_cache.init_app(app, 'JSON_CACHE')
+    fragment_cache.init_app(app, 'FRAGMENT_CACHE')
+    
+    from app import assets, compression
+    assets.init_app(app)
+    compression.init_app(app, 'GZIP')
+    
+    if pages:
+        from app import templating
+        templating.init_app(app)
+    
+    from app.writequeue import write_queue
+    write_queue.init_app(app, 'WRITE_BEHIND')
+    timer.mark('caches')
+    
+    from app import background
+    from app.archive import archive_completed
+    from app.changes import reconcile_counters
+    background.init_app(app)
+    background.schedule(app, 'reconcile-counters', app.config['COUNTER_RECONCILE_INTERVAL'],
+                        lambda: reconcile_counters(db.session))
+    background.schedule(app, 'archive-tasks', app.config['ARCHIVE_INTERVAL'],
+                        lambda: archive_completed(db.session, timedelta(days=app.config['ARCHIVE_AFTER_DAYS']),
+                                                  app.config['ARCHIVE_BATCH_SIZE']))
+    timer.mark('background')
+    
+    
+    from app.schema import ensure_schema
     with app.app_context():
-        db.create_all()
+        checked = ensure_schema(force=app.config['SCHEMA_CHECK'] == 'always')
+    timer.mark('schema' if checked else 'schema (fingerprint matched)')
     
+    app.extensions['startup_timings'] = timer
+    app.logger.info('Started in %.1f ms: %s', timer.total * 1000, timer.summary())
     return app
@@ -0,0 +1,106 @@
+"""Hot/cold split of the task table.
+
+Tasks that were completed and then left alone for ``ARCHIVE_AFTER_DAYS``
+are moved from ``task`` to ``task_archive`` in batches, by the
+``archive-tasks`` background job or ``flask tasks archive``. The hot table,
+its indexes and the search index then hold what the pages show, not years
+of finished work. Listings include archived tasks on request, and reopening
+one moves it back first.
+
+To everything following the task table an archived task looks deleted: it
+leaves a tombstone and a ``deleted`` event, and the total and completed
+counters drop while ``archived`` rises. The task table uses AUTOINCREMENT,
+so a new task can never take the id of an archived one.
+"""
+from datetime import datetime
+
+from sqlalchemy import DateTime, bindparam, delete, insert, select, union_all
+
+from app.changes import adjust_counters, bump_version, log_deletions, record_bulk_writes
+from app.events import record_events, task_event
+from app.models import ArchivedTask, Task
+from app.serializers import select_tasks
+
+tasks = Task.__table__
+archive = ArchivedTask.__table__
+
+ARCHIVED_COLUMNS = ('id', 'title', 'description', 'completed', 'created_at', 'updated_at', 'version')
+
+
+def archive_batch(session, cutoff, batch_size):
+    """Move up to ``batch_size`` tasks completed before ``cutoff``; returns how many."""
+    # Taking the write lock first means two workers never pick the same rows
+    version = bump_version(session)
+    # '= 1', not 'IS 1': only the former seeks ix_task_completed_updated_at_id
+    ids = session.scalars(
+        select(tasks.c.id)
+        .where(tasks.c.completed == True, tasks.c.updated_at < cutoff)
+        .order_by(tasks.c.updated_at).limit(batch_size)
+    ).all()
+    if not ids:
+        session.rollback()
+        return 0
+
+    columns = [tasks.c[name] for name in ARCHIVED_COLUMNS]
+    session.execute(insert(archive).from_select(
+        [*ARCHIVED_COLUMNS, 'archived_at'],
+        select(*columns, bindparam('archived_at', datetime.utcnow(), type_=DateTime))
+        .where(tasks.c.id.in_(ids))
+    ))
+    session.execute(delete(tasks).where(tasks.c.id.in_(ids)))
+    log_deletions(session, ids, version)
+    adjust_counters(session, total=-len(ids), completed=-len(ids), archived=len(ids))
+    record_events(session, [task_event('deleted', task_id) for task_id in ids])
+    record_bulk_writes(session, deleted=ids)
+    session.commit()
+    return len(ids)
+
+
+def archive_completed(session, older_than, batch_size, progress=None):
+    """Archive every task completed more than ``older_than`` ago; returns how many.
+
+    Each batch is its own transaction, so writers get the lock in between.
+    ``progress(moved)`` is called after each batch.
+    """
+    cutoff = datetime.utcnow() - older_than
+    moved = 0
+    while True:
+        count = archive_batch(session, cutoff, batch_size)
+        moved += count
+        if count and progress:
+            progress(moved)
+        if count < batch_size:
+            return moved
+
+
+def restore_archived(session, task_id):
+    """Move an archived task back into the task table; returns it, or None.
+
+    Runs in the caller's transaction and flushes, so the restored task is
+    counted, versioned and announced like a newly created one.
+    """
+    row = session.execute(select(archive).where(archive.c.id == task_id)).first()
+    if row is None:
+        return None
+    session.execute(delete(archive).where(archive.c.id == task_id))
+    adjust_counters(session, archived=-1)
+    task = Task(**{name: getattr(row, name) for name in ARCHIVED_COLUMNS})
+    session.add(task)
+    session.flush()
+    return task
+
+
+def select_with_archived(session, listing=None):
+    """``select_tasks()`` over the hot and archived tasks together.
+
+    Returns the query and its sort columns: those of ``listing`` when given,
+    whose filters then apply to both tables, and ``(created_at, id)``
+    otherwise.
+    """
+    branches = [select_tasks(session), select_tasks(session, archive)]
+    if listing is not None:
+        branches = [branch.where(*listing.criteria(table))
+                    for branch, table in zip(branches, (tasks, archive))]
+    combined = union_all(*branches).subquery('all_tasks')
+    order = listing.order(combined) if listing is not None else (combined.c.created_at, combined.c.id)
+    return select(*combined.c), order
@@ -0,0 +1,252 @@
+"""ASGI front end for the JSON API (see asgi.py at the top level).
+
+Read-only ``GET /api/...`` requests run the usual Flask views on the event
+loop, with their queries going through SQLAlchemy's asyncio extension:
+while one request waits on the database the loop serves the others, and no
+thread is held. ``/api/tasks/events`` streams are coroutines, so idle SSE
+clients cost no threads at all.
+
+Everything else (pages, writes, streamed exports) runs the WSGI app on a
+pool of ``ASYNC_API_THREADS`` threads, and so does every query when there is
+no async driver (aiosqlite) installed. Response bodies are always sent from
+the event loop, so a slow client never holds a pool thread while it reads.
+"""
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.wrappers import Request
+
+from app import metrics
+from app.changes import subscribe
+from app.events import LATEST_EVENT, stream_events_async
+from app.storage import READ_BIND_ENVIRON_KEY, create_async_read_engine
+from app.streaming import requested_stream_format
+
+EVENTS_PATH = '/api/tasks/events'
+# Streamed like the ?format=ndjson lists, so never buffered on the loop
+EXPORT_PATH = '/api/tasks/export'
+
+# Request bodies larger than this are spooled to a temporary file
+MAX_MEMORY_BODY = 1024 * 1024
+
+SSE_HEADERS = [
+    (b'content-type', b'text/event-stream; charset=utf-8'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),
+]
+
+
+async def read_body(receive):
+    body = tempfile.SpooledTemporaryFile(MAX_MEMORY_BODY)
+    more = True
+    while more:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body.write(message.get('body', b''))
+        more = message.get('more_body', False)
+    body.seek(0)
+    return body
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def build_environ(scope, body):
+    """The WSGI environ for an ASGI HTTP ``scope`` and its request body."""
+    root = scope.get('root_path', '')
+    path = scope['path']
+    if root and path.startswith(root):
+        path = path[len(root):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+        environ['REMOTE_PORT'] = str(scope['client'][1])
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = name
+        else:
+            key = 'HTTP_' + name
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def _start_message(status, headers):
+    return {
+        'type': 'http.response.start',
+        'status': int(status[:3]),
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                    for name, value in headers],
+    }
+
+
+class AsyncAPI:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        config = flask_app.config
+        self.poll_interval = config['SSE_POLL_INTERVAL']
+        self.heartbeat_interval = config['SSE_HEARTBEAT_INTERVAL']
+        self.engine = create_async_read_engine(flask_app) if config['ASYNC_DATABASE'] else None
+        if self.engine is not None and config['METRICS_ENABLED']:
+            metrics.instrument_engine(self.engine.sync_engine)
+        self.pool = ThreadPoolExecutor(config['ASYNC_API_THREADS'], thread_name_prefix='asgi')
+        self._loop = None
+        self._committed = None
+        subscribe(self._commit_seen)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+        self._bind_loop()
+
+        environ = build_environ(scope, await read_body(receive))
+        method, path = environ['REQUEST_METHOD'], environ['PATH_INFO']
+        if method == 'GET' and path == EVENTS_PATH:
+            await self.stream_events(environ, receive, send)
+        elif (self.engine is not None and method in ('GET', 'HEAD') and path.startswith('/api/')
+              and path != EXPORT_PATH and requested_stream_format(Request(environ)) is None):
+            async with self.engine.connect() as conn:
+                status, headers, body = await conn.run_sync(self._call_app, environ)
+            await send(_start_message(status, headers))
+            await send({'type': 'http.response.body', 'body': body})
+        else:
+            await self.call_in_pool(environ, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self._bind_loop()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.engine is not None:
+                    await self.engine.dispose()
+                self.pool.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._committed = asyncio.Event()
+
+    def _commit_seen(self, changes):
+        # Runs on the pool thread that committed
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wake_streams)
+
+    def _wake_streams(self):
+        self._committed.set()
+        self._committed = asyncio.Event()
+
+    def _call_app(self, conn, environ):
+        """Run the WSGI app with reads on ``conn``, inside ``run_sync()``."""
+        environ[READ_BIND_ENVIRON_KEY] = conn
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [status, headers]
+
+        body = self.flask_app(environ, start_response)
+        try:
+            data = b''.join(body)
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+        return started[0], started[1], data
+
+    def _start_app(self, environ):
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [status, headers]
+
+        body = self.flask_app(environ, start_response)
+        chunks = iter(body)
+        first = next(chunks, None)
+        status, headers = started
+        # A response with a length is already in memory; take all of it
+        # rather than coming back to the pool for each chunk
+        if first is not None and any(name.lower() == 'content-length' for name, _ in headers):
+            first = first + b''.join(chunks)
+        return status, headers, body, chunks, first
+
+    async def call_in_pool(self, environ, receive, send):
+        loop = asyncio.get_running_loop()
+        status, headers, body, chunks, chunk = await loop.run_in_executor(
+            self.pool, self._start_app, environ)
+        disconnected = None
+        try:
+            await send(_start_message(status, headers))
+            while chunk is not None:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                if disconnected is None:
+                    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+                elif disconnected.done():
+                    return
+                chunk = await loop.run_in_executor(self.pool, next, chunks, None)
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if disconnected is not None:
+                disconnected.cancel()
+            if hasattr(body, 'close'):
+                await loop.run_in_executor(self.pool, body.close)
+
+    async def fetch(self, statement):
+        if self.engine is not None:
+            async with self.engine.connect() as conn:
+                return (await conn.execute(statement)).all()
+        return await asyncio.get_running_loop().run_in_executor(self.pool, self._fetch, statement)
+
+    def _fetch(self, statement):
+        with self.flask_app.extensions['read_engine'].connect() as conn:
+            return conn.execute(statement).all()
+
+    async def stream_events(self, environ, receive, send):
+        request = Request(environ)
+        # EventSource resends the last id it saw when it reconnects
+        last_id = request.headers.get('Last-Event-ID', type=int)
+        if last_id is None:
+            last_id = request.args.get('last_event_id', type=int)
+        if last_id is None:
+            last_id = (await self.fetch(LATEST_EVENT))[0][0] or 0
+
+        frames = stream_events_async(self.fetch, last_id, self.poll_interval,
+                                     self.heartbeat_interval, lambda: self._committed)
+        disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': SSE_HEADERS})
+            async for frame in frames:
+                if disconnected.done():
+                    return
+                await send({'type': 'http.response.body', 'body': frame.encode(), 'more_body': True})
+        finally:
+            disconnected.cancel()
+            await frames.aclose()
@@ -0,0 +1,125 @@
+"""Fingerprinted, precompressed static assets.
+
+``asset_url('js/app.js')`` in a template links to a copy of the file named
+after a hash of its content, e.g. ``/assets/js/app.3f2a1b9c0d4e.js``, which
+is served with a one-year ``immutable`` Cache-Control. A deploy that changes
+a file changes its URL, so browsers neither revalidate nor keep a stale copy.
+
+``flask tasks build-assets`` writes the hashed copies, a gzip variant of
+each and a manifest to ``ASSETS_BUILD_DIR``; clients that accept gzip get
+the precompressed file. Copies from earlier builds are kept, so pages served
+by workers still running the previous release keep working. Without a build
+the hashes are computed at startup and the sources are served as they are.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import abort, request, send_file, url_for
+
+MANIFEST = 'manifest.json'
+
+# Files under the static folder that are fingerprinted
+ASSET_EXTENSIONS = ('.css', '.js')
+
+MAX_AGE = 365 * 24 * 3600
+
+
+def hashed_name(name, content):
+    root, ext = os.path.splitext(name)
+    return f'{root}.{hashlib.sha256(content).hexdigest()[:12]}{ext}'
+
+
+def source_assets(static_folder):
+    """Yield ``(name, path)`` for every asset, ``name`` relative to the folder."""
+    for dirpath, dirnames, filenames in os.walk(static_folder):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith(ASSET_EXTENSIONS):
+                path = os.path.join(dirpath, filename)
+                yield os.path.relpath(path, static_folder).replace(os.sep, '/'), path
+
+
+def build_assets(static_folder, build_dir):
+    """Write hashed copies, gzip variants and the manifest; returns the manifest."""
+    manifest = {}
+    for name, path in source_assets(static_folder):
+        with open(path, 'rb') as f:
+            content = f.read()
+        hashed = hashed_name(name, content)
+        target = os.path.join(build_dir, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(content)
+        compressed = gzip.compress(content, 9, mtime=0)
+        if len(compressed) < len(content):
+            with open(target + '.gz', 'wb') as f:
+                f.write(compressed)
+        manifest[name] = hashed
+
+    # Replaced in one step, so a worker starting meanwhile never reads half a file
+    temporary = os.path.join(build_dir, MANIFEST + '.tmp')
+    with open(temporary, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(temporary, os.path.join(build_dir, MANIFEST))
+    return manifest
+
+
+class Assets:
+    def __init__(self, static_folder, build_dir):
+        self.static_folder = static_folder
+        self.build_dir = build_dir
+        # source name -> hashed name
+        self.urls = {}
+        # hashed name -> (path, path of the gzip variant or None)
+        self.files = {}
+
+    def load(self):
+        self.urls.clear()
+        self.files.clear()
+        manifest_path = os.path.join(self.build_dir, MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            for name, hashed in manifest.items():
+                path = os.path.join(self.build_dir, hashed)
+                compressed = path + '.gz'
+                self.urls[name] = hashed
+                self.files[hashed] = (path, compressed if os.path.exists(compressed) else None)
+        else:
+            for name, path in source_assets(self.static_folder):
+                with open(path, 'rb') as f:
+                    hashed = hashed_name(name, f.read())
+                self.urls[name] = hashed
+                self.files[hashed] = (path, None)
+
+    def url(self, name):
+        hashed = self.urls.get(name)
+        if hashed is None:
+            return url_for('static', filename=name)
+        return url_for('assets', filename=hashed)
+
+    def send(self, filename):
+        if filename not in self.files:
+            abort(404)
+        path, compressed = self.files[filename]
+        mimetype = mimetypes.guess_type(path)[0]
+        if compressed and request.accept_encodings['gzip']:
+            response = send_file(compressed, mimetype=mimetype, max_age=MAX_AGE)
+            response.content_encoding = 'gzip'
+        else:
+            response = send_file(path, mimetype=mimetype, max_age=MAX_AGE)
+        response.cache_control.immutable = True
+        response.vary.add('Accept-Encoding')
+        return response
+
+
+def init_app(app):
+    build_dir = app.config['ASSETS_BUILD_DIR'] or os.path.join(app.instance_path, 'assets')
+    assets = Assets(app.static_folder, build_dir)
+    assets.load()
+    app.extensions['assets'] = assets
+    app.add_url_rule('/assets/<path:filename>', 'assets', assets.send)
+    app.add_template_global(assets.url, 'asset_url')
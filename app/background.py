@@ -0,0 +1,73 @@
+import logging
+import os
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class PeriodicJob:
+    """Run ``func`` every ``interval`` seconds on a daemon thread.
+
+    The thread is started lazily by ``ensure_running()`` and restarted in any
+    process that does not own it yet, so a job scheduled before a pre-fork
+    server forks its workers runs in each worker, not in the dead parent
+    thread.
+    """
+
+    def __init__(self, name, interval, func):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._lock = threading.Lock()
+        self._pid = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def ensure_running(self, app):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(app, self._stop),
+                                            name=f'job-{self.name}', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the thread and wait up to ``timeout`` seconds for it to exit."""
+        self._stop.set()
+        self._pid = None
+        thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _run(self, app, stop):
+        while not stop.wait(self.interval):
+            with app.app_context():
+                try:
+                    self.func()
+                except Exception:
+                    log.exception('Periodic job %s failed', self.name)
+
+
+def schedule(app, name, interval, func):
+    """Run ``func()`` in an app context every ``interval`` seconds.
+
+    A falsy interval leaves the job disabled.
+    """
+    if interval:
+        app.extensions.setdefault('periodic_jobs', {})[name] = PeriodicJob(name, interval, func)
+
+
+def stop_all(app, timeout=None):
+    for job in app.extensions.get('periodic_jobs', {}).values():
+        job.stop(timeout)
+
+
+def init_app(app):
+    @app.before_request
+    def start_periodic_jobs():
+        for job in app.extensions.get('periodic_jobs', {}).values():
+            job.ensure_running(app)
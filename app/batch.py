@@ -0,0 +1,138 @@
+from datetime import datetime
+
+from sqlalchemy import delete, insert, select, update
+
+from app import db
+from app.changes import adjust_counters, bump_version, log_deletions, record_bulk_writes
+from app.events import record_events, task_event
+from app.forms import validate_task_data
+from app.models import Task
+
+OPERATIONS = ('create', 'update', 'delete')
+TASK_FIELDS = ('title', 'description', 'completed')
+
+
+class BatchError(Exception):
+    def __init__(self, results):
+        super().__init__('Batch rejected')
+        self.results = results
+
+
+def _check_item(index, item, existing_ids):
+    if not isinstance(item, dict) or item.get('op') not in OPERATIONS:
+        return {'index': index, 'status': 'error',
+                'errors': {'op': ['Must be one of: ' + ', '.join(OPERATIONS)]}}
+
+    op = item['op']
+    if op != 'create':
+        if not isinstance(item.get('id'), int) or item['id'] not in existing_ids:
+            return {'index': index, 'op': op, 'id': item.get('id'), 'status': 'error',
+                    'errors': {'id': ['Task not found']}}
+    if op == 'delete':
+        return None
+
+    data = {field: item[field] for field in TASK_FIELDS if field in item}
+    errors = validate_task_data(data, partial=(op == 'update'))
+    if errors:
+        return {'index': index, 'op': op, 'id': item.get('id'), 'status': 'error', 'errors': errors}
+    return None
+
+
+def apply_batch(items):
+    """Apply a list of create/update/delete operations in one transaction.
+
+    Every item is validated first; if any is invalid nothing is written and
+    ``BatchError`` carries the per-item results. Otherwise creates, updates
+    and deletes each run as a single bulk statement, in that order, and the
+    per-item results are returned in input order.
+    """
+    ids = {item['id'] for item in items
+           if isinstance(item, dict) and item.get('op') in ('update', 'delete')
+           and isinstance(item.get('id'), int)}
+    # id -> completed, tracked through the batch to keep the counters right
+    completed = {}
+    if ids:
+        completed = dict(db.session.execute(
+            select(Task.id, Task.completed).where(Task.id.in_(ids))
+        ).all())
+    existing_ids = set(completed)
+
+    failures = [r for r in (_check_item(i, item, existing_ids) for i, item in enumerate(items)) if r]
+    if failures:
+        raise BatchError(failures)
+
+    now = datetime.utcnow()
+    version = bump_version(db.session)
+    creates = [(i, item) for i, item in enumerate(items) if item['op'] == 'create']
+    updates = [(i, item) for i, item in enumerate(items) if item['op'] == 'update']
+    deletes = [(i, item) for i, item in enumerate(items) if item['op'] == 'delete']
+    results = [None] * len(items)
+    task_events = []
+
+    if creates:
+        rows = [{
+            'title': item['title'],
+            'description': item.get('description'),
+            'completed': item.get('completed', False),
+            'created_at': now,
+            'updated_at': now,
+            'version': version,
+        } for _, item in creates]
+        # SQLite has no insert sentinel, so sort_by_parameter_order would
+        # make SQLAlchemy insert row by row. Ids are assigned in VALUES order
+        # instead, which makes sorting by id restore the input order.
+        # render_nulls keeps rows with and without a description in one
+        # statement instead of splitting them into groups.
+        created = sorted(db.session.scalars(
+            insert(Task).returning(Task).execution_options(render_nulls=True), rows
+        ).all(), key=lambda task: task.id)
+        adjust_counters(db.session, total=len(created),
+                        completed=sum(bool(task.completed) for task in created))
+        for (i, _), task in zip(creates, created):
+            results[i] = {'index': i, 'op': 'create', 'id': task.id, 'status': 'ok',
+                          'task': task.to_dict()}
+            task_events.append(task_event('created', results[i]['task']))
+
+    if updates:
+        db.session.execute(update(Task), [
+            dict({field: item[field] for field in TASK_FIELDS if field in item},
+                 id=item['id'], updated_at=now, version=version)
+            for _, item in updates
+        ])
+        completed_delta = 0
+        for _, item in updates:
+            if 'completed' in item:
+                completed_delta += bool(item['completed']) - bool(completed[item['id']])
+                completed[item['id']] = item['completed']
+        adjust_counters(db.session, completed=completed_delta)
+        updated = {task.id: task for task in db.session.scalars(
+            select(Task).where(Task.id.in_([item['id'] for _, item in updates]))
+            .execution_options(populate_existing=True)
+        )}
+        for i, item in updates:
+            results[i] = {'index': i, 'op': 'update', 'id': item['id'], 'status': 'ok',
+                          'task': updated[item['id']].to_dict()}
+            task_events.append(task_event('updated', results[i]['task']))
+
+    if deletes:
+        deleted_ids = {item['id'] for _, item in deletes}
+        db.session.execute(
+            delete(Task).where(Task.id.in_(deleted_ids)),
+            execution_options={'synchronize_session': False}
+        )
+        log_deletions(db.session, sorted(deleted_ids), version)
+        adjust_counters(db.session, total=-len(deleted_ids),
+                        completed=-sum(bool(completed[task_id]) for task_id in deleted_ids))
+        task_events.extend(task_event('deleted', task_id) for task_id in sorted(deleted_ids))
+        for i, item in deletes:
+            results[i] = {'index': i, 'op': 'delete', 'id': item['id'], 'status': 'ok'}
+
+    record_events(db.session, task_events)
+    record_bulk_writes(
+        db.session,
+        created=[results[i]['id'] for i, _ in creates],
+        updated=[item['id'] for _, item in updates],
+        deleted=[item['id'] for _, item in deletes],
+    )
+    db.session.commit()
+    return results
@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+
+from app.changes import subscribe
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by entry count and total value size.
+
+    Values must be ``bytes`` or ``str`` so their size can be accounted; a
+    value larger than the byte budget is simply not cached.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.configure(max_entries, max_bytes)
+        self.reset_stats()
+
+    def configure(self, max_entries, max_bytes):
+        with self._lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def init_app(self, app, prefix):
+        self.configure(app.config[f'{prefix}_MAX_ENTRIES'], app.config[f'{prefix}_MAX_BYTES'])
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        size = len(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= len(self._entries.pop(key))
+            if size > self.max_bytes:
+                return
+            self._entries[key] = value
+            self._bytes += size
+            self._evict()
+
+    def invalidate(self, key):
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is not None:
+                self._bytes -= len(value)
+                self.invalidations += 1
+
+    def invalidate_where(self, predicate):
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self._bytes -= len(self._entries.pop(key))
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or self._bytes > self.max_bytes):
+            _, value = self._entries.popitem(last=False)
+            self._bytes -= len(value)
+            self.evictions += 1
+
+
+# Encoded API responses. Task entries are keyed by (id, row version) and list
+# entries by table version, so a worker never serves bytes older than the
+# version it just read, even when the write happened in another process;
+# write-through invalidation only frees the memory early.
+json_cache = LRUCache()
+
+# Rendered task-list HTML for the index page, keyed by table version.
+fragment_cache = LRUCache()
+
+# gzipped response bodies keyed by ETag (see app.compression); the tags
+# include the version, so nothing needs invalidating.
+gzip_cache = LRUCache()
+
+
+@subscribe
+def _invalidate_caches(changes):
+    stale = changes.updated | changes.deleted
+    json_cache.invalidate_where(
+        lambda key: key[0] == 'list' or (key[0] == 'task' and key[1] in stale)
+    )
+    fragment_cache.invalidate_where(lambda key: True)
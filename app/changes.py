@@ -0,0 +1,224 @@
+"""Bookkeeping shared by every write to the task table.
+
+Session events stamp each flushed ``Task`` with a new table version and
+collect the ids written by the transaction; once it commits, the collected
+``ChangeSet`` is handed to the callbacks registered with ``subscribe()``.
+The same transaction keeps the total/completed counters in step and leaves
+a tombstone in ``task_deletion`` for deleted tasks. Bulk statements bypass
+the ORM unit of work, so code issuing them calls ``bump_version()``,
+``adjust_counters()``, ``log_deletions()`` and ``record_bulk_writes()``
+itself.
+"""
+import logging
+from datetime import datetime
+
+from sqlalchemy import event, func, insert, inspect, select, update
+
+from app import db
+from app.models import ArchivedTask, Task, TaskCounter, TaskDeletion
+
+log = logging.getLogger(__name__)
+
+counters = TaskCounter.__table__
+deletions = TaskDeletion.__table__
+
+# Initial value of each counter for a database that does not have it yet.
+COUNTER_SEEDS = {
+    'version': lambda conn: 0,
+    # Highest version whose tombstones have been pruned; see app.sync.
+    'tombstone_horizon': lambda conn: 0,
+    # Row counts, so pages can show them without a COUNT(*) over the table.
+    'total': lambda conn: conn.execute(select(func.count()).select_from(Task)).scalar(),
+    'completed': lambda conn: conn.execute(
+        select(func.count()).select_from(Task).where(Task.completed.is_(True))
+    ).scalar(),
+    # Tasks moved to task_archive; see app.archive.
+    'archived': lambda conn: conn.execute(select(func.count()).select_from(ArchivedTask)).scalar(),
+}
+
+STAT_COUNTERS = ('total', 'completed', 'archived')
+
+_subscribers = []
+
+
+class ChangeSet:
+    def __init__(self):
+        self.created = set()
+        self.updated = set()
+        self.deleted = set()
+        self.version = None
+
+    def __bool__(self):
+        return bool(self.created or self.updated or self.deleted)
+
+    def __repr__(self):
+        return (f'<ChangeSet v{self.version} created={sorted(self.created)} '
+                f'updated={sorted(self.updated)} deleted={sorted(self.deleted)}>')
+
+
+def subscribe(callback):
+    """Register ``callback(changes)`` to run after each commit that wrote tasks."""
+    _subscribers.append(callback)
+    return callback
+
+
+def seed_counters(conn):
+    existing = set(conn.execute(select(counters.c.name)).scalars())
+    for name, seed in COUNTER_SEEDS.items():
+        if name not in existing:
+            conn.execute(insert(counters).values(name=name, value=seed(conn),
+                                                 updated_at=datetime.utcnow()))
+
+
+def read_counter(session, name):
+    """Return ``(value, updated_at)`` for a counter."""
+    row = session.execute(
+        select(counters.c.value, counters.c.updated_at).where(counters.c.name == name)
+    ).one()
+    return row.value, row.updated_at
+
+
+def pending_changes(session):
+    return session.info.setdefault('task_changes', ChangeSet())
+
+
+def bump_version(session):
+    """Increment the table version inside the current transaction and return it."""
+    conn = session.connection()
+    conn.execute(
+        update(counters)
+        .where(counters.c.name == 'version')
+        .values(value=counters.c.value + 1, updated_at=datetime.utcnow())
+    )
+    version = conn.execute(
+        select(counters.c.value).where(counters.c.name == 'version')
+    ).scalar_one()
+    pending_changes(session).version = version
+    return version
+
+
+def adjust_counters(session, **deltas):
+    """Add ``deltas`` to the named counters inside the current transaction."""
+    conn = session.connection()
+    for name, delta in deltas.items():
+        if delta:
+            conn.execute(
+                update(counters).where(counters.c.name == name)
+                .values(value=counters.c.value + delta, updated_at=datetime.utcnow())
+            )
+
+
+def task_stats(session):
+    """Return the maintained task counts without scanning the task table."""
+    values = dict(session.execute(
+        select(counters.c.name, counters.c.value).where(counters.c.name.in_(STAT_COUNTERS))
+    ).all())
+    return {
+        'total': values['total'],
+        'completed': values['completed'],
+        'open': values['total'] - values['completed'],
+        'archived': values['archived'],
+    }
+
+
+def reconcile_counters(session):
+    """Reset the stat counters to the real counts; returns the drift found.
+
+    The counter rows are locked first so no writer can commit between the
+    count and the fix.
+    """
+    session.execute(
+        update(counters).where(counters.c.name.in_(STAT_COUNTERS)).values(value=counters.c.value)
+    )
+    stored = task_stats(session)
+    actual = {name: seed(session.connection()) for name, seed in COUNTER_SEEDS.items()
+              if name in STAT_COUNTERS}
+    drift = {name: stored[name] - actual[name] for name in STAT_COUNTERS
+             if stored[name] != actual[name]}
+    for name in drift:
+        session.execute(
+            update(counters).where(counters.c.name == name)
+            .values(value=actual[name], updated_at=datetime.utcnow())
+        )
+    session.commit()
+    if drift:
+        log.warning('Task counters drifted from the table and were reset: %s', drift)
+    return drift
+
+
+def log_deletions(session, task_ids, version):
+    """Write tombstones for deleted tasks inside the current transaction."""
+    now = datetime.utcnow()
+    session.connection().execute(insert(deletions), [
+        {'task_id': task_id, 'version': version, 'deleted_at': now} for task_id in task_ids
+    ])
+
+
+def record_bulk_writes(session, created=(), updated=(), deleted=()):
+    changes = pending_changes(session)
+    changes.created.update(created)
+    changes.updated.update(updated)
+    changes.deleted.update(deleted)
+
+
+def _was_completed(task):
+    history = inspect(task).attrs.completed.history
+    if history.deleted:
+        return bool(history.deleted[0])
+    if history.unchanged:
+        return bool(history.unchanged[0])
+    return bool(task.completed)
+
+
+def _task_writes(session):
+    created = [obj for obj in session.new if isinstance(obj, Task)]
+    updated = [obj for obj in session.dirty
+               if isinstance(obj, Task) and session.is_modified(obj)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Task)]
+    return created, updated, deleted
+
+
+@event.listens_for(db.session, 'before_flush')
+def _stamp_versions(session, flush_context, instances):
+    created, updated, deleted = _task_writes(session)
+    if not (created or updated or deleted):
+        return
+    version = bump_version(session)
+    for task in created + updated:
+        task.version = version
+    if deleted:
+        log_deletions(session, [task.id for task in deleted], version)
+
+    completed = sum(bool(task.completed) for task in created)
+    completed += sum(bool(task.completed) - _was_completed(task) for task in updated)
+    completed -= sum(_was_completed(task) for task in deleted)
+    adjust_counters(session, total=len(created) - len(deleted), completed=completed)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_writes(session, flush_context):
+    created, updated, deleted = _task_writes(session)
+    if created or updated or deleted:
+        record_bulk_writes(
+            session,
+            created=[task.id for task in created],
+            updated=[task.id for task in updated],
+            deleted=[task.id for task in deleted],
+        )
+
+
+@event.listens_for(db.session, 'after_commit')
+def _publish(session):
+    changes = session.info.pop('task_changes', None)
+    if not changes:
+        return
+    for callback in _subscribers:
+        try:
+            callback(changes)
+        except Exception:
+            log.exception('Task change subscriber %r failed', callback)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard(session):
+    session.info.pop('task_changes', None)
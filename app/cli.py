@@ -0,0 +1,148 @@
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app import db
+
+tasks_cli = AppGroup('tasks', help='Task maintenance commands.')
+
+
+@tasks_cli.command('prune-tombstones')
+@click.option('--days', type=int, default=None,
+              help='Keep tombstones newer than this many days (default: TOMBSTONE_RETENTION_DAYS).')
+def prune_tombstones_command(days):
+    """Delete old delete tombstones used by /api/tasks/changes."""
+    from app.sync import prune_tombstones
+
+    if days is None:
+        days = current_app.config['TOMBSTONE_RETENTION_DAYS']
+    pruned = prune_tombstones(db.session, datetime.utcnow() - timedelta(days=days))
+    click.echo(f'Pruned {pruned} tombstones older than {days} days')
+
+
+@tasks_cli.command('archive')
+@click.option('--days', type=int, default=None,
+              help='Archive tasks completed more than this many days ago (default: ARCHIVE_AFTER_DAYS).')
+@click.option('--batch-size', type=int, default=None,
+              help='Tasks moved per transaction (default: ARCHIVE_BATCH_SIZE).')
+def archive_command(days, batch_size):
+    """Move old completed tasks from the task table to task_archive."""
+    from app.archive import archive_completed
+
+    if days is None:
+        days = current_app.config['ARCHIVE_AFTER_DAYS']
+    batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+    moved = archive_completed(db.session, timedelta(days=days), batch_size,
+                              lambda moved: click.echo(f'\r{moved} tasks archived', nl=False, err=True))
+    if moved:
+        click.echo(err=True)
+    click.echo(f'Archived {moved} tasks completed more than {days} days ago')
+
+
+@tasks_cli.command('reconcile-counters')
+def reconcile_counters_command():
+    """Check the maintained task counters against real counts and fix drift."""
+    from app.changes import reconcile_counters
+
+    drift = reconcile_counters(db.session)
+    if drift:
+        click.echo('Counters drifted and were reset: ' +
+                   ', '.join(f'{name} off by {delta:+d}' for name, delta in drift.items()))
+    else:
+        click.echo('Counters match the task table')
+
+
+@tasks_cli.command('compile-templates')
+def compile_templates_command():
+    """Fill the Jinja bytecode cache, e.g. while building a deployment."""
+    from app.templating import precompile_templates
+
+    if current_app.jinja_env.bytecode_cache is None:
+        raise click.ClickException('JINJA_BYTECODE_CACHE is disabled')
+    names = precompile_templates(current_app)
+    click.echo(f'Compiled {len(names)} templates')
+
+
+@tasks_cli.command('startup-timings')
+def startup_timings_command():
+    """Show how long each phase of creating the app took."""
+    timer = current_app.extensions['startup_timings']
+    for phase, seconds in timer.phases:
+        click.echo(f'{phase:<32} {seconds * 1000:8.1f} ms')
+    click.echo(f'{"total":<32} {timer.total * 1000:8.1f} ms')
+
+
+@tasks_cli.command('build-assets')
+def build_assets_command():
+    """Write fingerprinted and gzipped static assets, e.g. while building a deployment."""
+    from app.assets import build_assets
+
+    assets = current_app.extensions['assets']
+    manifest = build_assets(assets.static_folder, assets.build_dir)
+    assets.load()
+    click.echo(f'Built {len(manifest)} assets into {assets.build_dir}')
+
+
+def _open(path, mode):
+    if path == '-':
+        return nullcontext(click.get_text_stream('stdin' if mode == 'r' else 'stdout'))
+    # csv handles line endings itself
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def _transfer_format(path, fmt):
+    from app.transfer import format_for_name
+
+    fmt = fmt or format_for_name(path)
+    if fmt is None:
+        raise click.UsageError('Cannot tell the format from the file name; pass --format')
+    return fmt
+
+
+@tasks_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None,
+              help='Input format (default: from the file extension).')
+@click.option('--chunk-size', type=int, default=None,
+              help='Rows per insert transaction (default: IMPORT_CHUNK_SIZE).')
+def import_command(path, fmt, chunk_size):
+    """Import tasks from a CSV or JSON Lines file ('-' for stdin)."""
+    from app.transfer import TransferError, import_tasks
+
+    fmt = _transfer_format(path, fmt)
+    chunk_size = chunk_size or current_app.config['IMPORT_CHUNK_SIZE']
+
+    def progress(result):
+        click.echo(f'\r{result.imported} rows imported ({result.rate:.0f} rows/s)', nl=False, err=True)
+
+    try:
+        with _open(path, 'r') as stream:
+            result = import_tasks(db.session, stream, fmt, chunk_size,
+                                  current_app.config['IMPORT_MAX_REPORTED_ERRORS'], progress)
+    except TransferError as exc:
+        click.echo(err=True)
+        raise click.ClickException(str(exc))
+    click.echo(err=True)
+    for rejected in result.errors:
+        messages = '; '.join(f'{field}: {", ".join(errors)}' for field, errors in rejected['errors'].items())
+        click.echo(f'line {rejected["line"]}: {messages}', err=True)
+    click.echo(f'Imported {result.imported} tasks in {result.elapsed:.1f} s '
+               f'({result.rate:.0f} rows/s), rejected {result.rejected}')
+
+
+@tasks_cli.command('export')
+@click.argument('path', type=click.Path(dir_okay=False, allow_dash=True), default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None,
+              help='Output format (default: from the file extension, jsonl for stdout).')
+@click.option('--include-archived', is_flag=True, help='Export archived tasks too.')
+def export_command(path, fmt, include_archived):
+    """Export every task as CSV or JSON Lines to a file ('-' for stdout)."""
+    from app.transfer import iter_export
+
+    fmt = fmt or ('jsonl' if path == '-' else _transfer_format(path, fmt))
+    with _open(path, 'w') as out:
+        for chunk in iter_export(db.session, fmt, current_app.config['EXPORT_BATCH_SIZE'], include_archived):
+            out.write(chunk)
@@ -0,0 +1,67 @@
+"""gzip for large dynamic responses.
+
+Responses of a compressible type and at least ``GZIP_MIN_SIZE`` bytes are
+gzipped for clients that accept it. A response with an ETag (the task list
+and detail endpoints) is compressed once per ETag: the tags carry the table
+or row version, so a cached body is never stale and old entries just age
+out of the LRU. Streamed bodies (the NDJSON and JSON array modes of
+/api/tasks) are compressed chunk by chunk with a sync flush, so they still
+reach the client as they are produced. Files and Server-Sent Events are
+left alone.
+"""
+import gzip
+import zlib
+
+from flask import request
+
+from app.cache import gzip_cache
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript', 'text/csv',
+    'text/css', 'text/html', 'text/javascript', 'text/plain',
+}
+
+
+def iter_gzip(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def init_app(app, prefix):
+    gzip_cache.init_app(app, f'{prefix}_CACHE')
+    if not app.config[f'{prefix}_ENABLED']:
+        return
+    level = app.config[f'{prefix}_LEVEL']
+    min_size = app.config[f'{prefix}_MIN_SIZE']
+
+    @app.after_request
+    def gzip_response(response):
+        if (response.direct_passthrough or response.mimetype not in COMPRESSIBLE_TYPES
+                or response.status_code in (204, 304) or response.content_encoding):
+            return response
+        response.vary.add('Accept-Encoding')
+        if not request.accept_encodings['gzip']:
+            return response
+
+        # Error pages from werkzeug arrive as an iterator, but with a length
+        if response.is_streamed and response.content_length is None:
+            response.response = iter_gzip(response.response, level)
+        else:
+            etag, _ = response.get_etag()
+            body = gzip_cache.get(etag) if etag else None
+            if body is None:
+                data = response.get_data()
+                if len(data) < min_size:
+                    return response
+                body = gzip.compress(data, level, mtime=0)
+                if etag:
+                    gzip_cache.set(etag, body)
+            response.set_data(body)
+        response.content_encoding = 'gzip'
+        return response
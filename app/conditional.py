@@ -0,0 +1,33 @@
+from datetime import timezone
+
+from flask import make_response, request
+
+
+def _is_fresh(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        # HTTP dates have whole-second resolution.
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def conditional_response(etag, last_modified, build):
+    """Answer a conditional GET from its validators alone.
+
+    ``last_modified`` is a naive UTC datetime. ``build`` is only called when
+    the client's cached copy is stale, so a matching ``If-None-Match`` (or
+    ``If-Modified-Since``) costs no row reads or serialization.
+    """
+    if last_modified is not None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+
+    if _is_fresh(etag, last_modified):
+        response = make_response('', 304)
+    else:
+        response = make_response(build())
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.vary.add('Accept')
+    return response
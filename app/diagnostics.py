@@ -0,0 +1,123 @@
+"""Query diagnostics: slow-query log and N+1 detection.
+
+With ``QUERY_DIAGNOSTICS`` on, every statement slower than
+``SLOW_QUERY_THRESHOLD_MS`` is logged with its parameters and query plan,
+and each request's statements are grouped by shape (the SQL with bound
+parameters and ``IN`` lists collapsed). A shape run
+``N_PLUS_ONE_THRESHOLD`` times or more by one request is reported as an N+1
+pattern; with ``QUERY_DIAGNOSTICS_STRICT`` the request fails instead, which
+is how the test suite catches one.
+
+Statements issued while a response body streams are not counted, since
+long-lived streams poll by design.
+"""
+import logging
+import re
+import time
+from collections import Counter
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+
+from app import db
+
+log = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+MAX_PARAMETER_LENGTH = 500
+
+
+class QueryDiagnosticsError(RuntimeError):
+    pass
+
+
+def statement_shape(statement):
+    return _PLACEHOLDER_LIST.sub('(?)', _WHITESPACE.sub(' ', statement)).strip()
+
+
+def _format_parameters(parameters):
+    text = repr(parameters)
+    if len(text) > MAX_PARAMETER_LENGTH:
+        text = text[:MAX_PARAMETER_LENGTH] + '...'
+    return text
+
+
+def query_plan(dbapi_connection, dialect, statement, parameters):
+    """Return the plan of ``statement`` as text lines, or None if unavailable."""
+    sqlite = dialect.name == 'sqlite'
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(('EXPLAIN QUERY PLAN ' if sqlite else 'EXPLAIN ') + statement, parameters)
+        # SQLite rows are (id, parent, notused, detail)
+        return [str(row[-1]) if sqlite else ' '.join(str(value) for value in row)
+                for row in cursor.fetchall()]
+    except Exception:
+        # Statements that cannot be explained (DDL, PRAGMA, ...)
+        return None
+    finally:
+        cursor.close()
+
+
+class QueryDiagnostics:
+    def __init__(self, app):
+        self.slow_threshold = app.config['SLOW_QUERY_THRESHOLD_MS'] / 1000
+        self.repeat_threshold = app.config['N_PLUS_ONE_THRESHOLD']
+        self.strict = app.config['QUERY_DIAGNOSTICS_STRICT']
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context.diagnostics_started = time.perf_counter()
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context.diagnostics_started
+        if elapsed >= self.slow_threshold:
+            self.log_slow_query(conn, statement, parameters, executemany, elapsed)
+        if has_app_context():
+            shapes = g.get('query_shapes')
+            if shapes is not None:
+                shapes[statement_shape(statement)] += 1
+
+    def log_slow_query(self, conn, statement, parameters, executemany, elapsed):
+        plan = None
+        if not executemany:
+            plan = query_plan(conn.connection.dbapi_connection, conn.dialect, statement, parameters)
+        log.warning(
+            'Slow query (%.1f ms): %s\n  parameters: %s\n  plan:\n    %s',
+            elapsed * 1000, statement, _format_parameters(parameters),
+            '\n    '.join(plan) if plan else '(unavailable)'
+        )
+
+    def check_request(self, shapes):
+        repeated = {shape: count for shape, count in shapes.items() if count >= self.repeat_threshold}
+        if not repeated:
+            return
+        details = '\n'.join(f'  {count}x {shape}' for shape, count in
+                            sorted(repeated.items(), key=lambda item: -item[1]))
+        message = f'Possible N+1 queries in {request.method} {request.path} ({request.endpoint}):\n{details}'
+        if self.strict:
+            raise QueryDiagnosticsError(message)
+        log.warning(message)
+
+
+def init_app(app):
+    if not app.config['QUERY_DIAGNOSTICS']:
+        return
+
+    diagnostics = QueryDiagnostics(app)
+    app.extensions['query_diagnostics'] = diagnostics
+    with app.app_context():
+        engines = {db.engine, app.extensions['read_engine']}
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', diagnostics.before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', diagnostics.after_cursor_execute)
+
+    @app.before_request
+    def start_query_shapes():
+        g.query_shapes = Counter()
+
+    @app.after_request
+    def check_query_shapes(response):
+        shapes = g.pop('query_shapes', None)
+        if shapes:
+            diagnostics.check_request(shapes)
+        return response
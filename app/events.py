@@ -0,0 +1,173 @@
+"""Server-Sent Events for task changes.
+
+Writes append rows to ``task_event`` inside their own transaction, so an
+event exists exactly when its change is committed. Each open stream polls
+the table for ids past the last one it sent; commits in the same process
+wake the streams at once, and commits from other workers are picked up on
+the next poll. ``stream_events_async()`` is the same loop for the ASGI front
+end, where an idle stream is a suspended coroutine instead of a thread.
+"""
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, event, func, insert, inspect, select
+
+from app import db
+from app.changes import subscribe
+from app.models import Task, TaskEvent
+
+events = TaskEvent.__table__
+
+# A write that changes only these is reported as a toggle.
+TOGGLE_ATTRS = {'completed', 'updated_at', 'version'}
+
+# Events are pruned whenever the id crosses a multiple of this.
+PRUNE_EVERY = 1000
+
+STREAM_BATCH = 500
+
+_committed = threading.Condition()
+_generation = 0
+
+
+def task_event(kind, task):
+    if kind == 'deleted':
+        return kind, task, {'id': task}
+    return kind, task['id'], {'task': task}
+
+
+def record_events(session, task_events):
+    """Append ``(kind, task_id, payload)`` tuples in the current transaction."""
+    if not task_events:
+        return
+    conn = session.connection()
+    now = datetime.utcnow()
+    conn.execute(insert(events), [
+        {'kind': kind, 'task_id': task_id, 'created_at': now,
+         'payload': json.dumps(dict(payload, type=kind), separators=(',', ':'))}
+        for kind, task_id, payload in task_events
+    ])
+
+    last_id = conn.execute(select(func.max(events.c.id))).scalar()
+    if (last_id - len(task_events)) // PRUNE_EVERY != last_id // PRUNE_EVERY:
+        retention = timedelta(minutes=current_app.config['TASK_EVENT_RETENTION_MINUTES'])
+        conn.execute(delete(events).where(events.c.created_at < now - retention))
+
+
+def _kind_of_update(task):
+    state = inspect(task)
+    changed = {attr.key for attr in state.attrs if attr.history.has_changes()}
+    return 'toggled' if 'completed' in changed and changed <= TOGGLE_ATTRS else 'updated'
+
+
+@event.listens_for(db.session, 'after_flush')
+def _record_flushed(session, flush_context):
+    task_events = []
+    for obj in session.new:
+        if isinstance(obj, Task):
+            task_events.append(task_event('created', obj.to_dict()))
+    for obj in session.dirty:
+        if isinstance(obj, Task) and session.is_modified(obj):
+            task_events.append(task_event(_kind_of_update(obj), obj.to_dict()))
+    for obj in session.deleted:
+        if isinstance(obj, Task):
+            task_events.append(task_event('deleted', obj.id))
+    record_events(session, task_events)
+
+
+@subscribe
+def _wake_streams(changes):
+    global _generation
+    with _committed:
+        _generation += 1
+        _committed.notify_all()
+
+
+LATEST_EVENT = select(func.max(events.c.id))
+OLDEST_EVENT = select(func.min(events.c.id))
+
+
+def latest_event_id(engine):
+    with engine.connect() as conn:
+        return conn.execute(LATEST_EVENT).scalar() or 0
+
+
+def _format(row):
+    return f'id: {row.id}\nevent: {row.kind}\ndata: {row.payload}\n\n'
+
+
+def events_after(last_id):
+    return (select(events.c.id, events.c.kind, events.c.payload)
+            .where(events.c.id > last_id).order_by(events.c.id).limit(STREAM_BATCH))
+
+
+def stream_events(engine, last_id, poll_interval, heartbeat_interval):
+    """Yield SSE frames for events after ``last_id``, forever.
+
+    Every poll uses a short-lived connection so an idle stream never holds a
+    read transaction open against writers.
+    """
+    yield f'retry: {int(poll_interval * 1000)}\n\n'
+
+    with engine.connect() as conn:
+        oldest = conn.execute(OLDEST_EVENT).scalar()
+    if oldest is not None and last_id < oldest - 1:
+        # The client missed events that were pruned; it must reload.
+        yield 'event: reset\ndata: {}\n\n'
+
+    last_sent = time.monotonic()
+    while True:
+        seen = _generation
+        with engine.connect() as conn:
+            rows = conn.execute(events_after(last_id)).all()
+        if rows:
+            last_id = rows[-1].id
+            last_sent = time.monotonic()
+            yield ''.join(_format(row) for row in rows)
+            if len(rows) == STREAM_BATCH:
+                continue
+        elif time.monotonic() - last_sent >= heartbeat_interval:
+            last_sent = time.monotonic()
+            yield ': keep-alive\n\n'
+
+        with _committed:
+            if _generation == seen:
+                _committed.wait(poll_interval)
+
+
+async def stream_events_async(fetch, last_id, poll_interval, heartbeat_interval, next_commit):
+    """Async version of ``stream_events()``.
+
+    ``await fetch(statement)`` returns the statement's rows, and
+    ``next_commit()`` an ``asyncio.Event`` the next commit in this process
+    sets.
+    """
+    yield f'retry: {int(poll_interval * 1000)}\n\n'
+
+    oldest = (await fetch(OLDEST_EVENT))[0][0]
+    if oldest is not None and last_id < oldest - 1:
+        yield 'event: reset\ndata: {}\n\n'
+
+    loop = asyncio.get_running_loop()
+    last_sent = loop.time()
+    while True:
+        committed = next_commit()
+        rows = await fetch(events_after(last_id))
+        if rows:
+            last_id = rows[-1].id
+            last_sent = loop.time()
+            yield ''.join(_format(row) for row in rows)
+            if len(rows) == STREAM_BATCH:
+                continue
+        elif loop.time() - last_sent >= heartbeat_interval:
+            last_sent = loop.time()
+            yield ': keep-alive\n\n'
+
+        try:
+            await asyncio.wait_for(committed.wait(), poll_interval)
+        except asyncio.TimeoutError:
+            pass
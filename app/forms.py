@@ -1,6 +1,7 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, TextAreaField, BooleanField, SubmitField
-from wtforms.validators import DataRequired, Length, Optional
+from werkzeug.datastructures import MultiDict
+from wtforms import Form, StringField, TextAreaField, BooleanField, SubmitField
+from wtforms.validators import DataRequired, Length, Optional, StopValidation, ValidationError
 
 class TaskForm(FlaskForm):
     title = StringField('Title', validators=[
@@ -13,3 +14,92 @@ class TaskForm(FlaskForm):
     ])
     completed = BooleanField('Completed')
     submit = SubmitField('Save Task')
+
+
+class TaskDataForm(Form):
+    """TaskForm's fields without CSRF, for validating JSON payloads."""
+    title = TaskForm.title
+    description = TaskForm.description
+
+
+def validate_task_data(data, partial=False):
+    """Validate a task dict against the TaskForm rules.
+
+    Returns a dict mapping field names to lists of error messages; an empty
+    dict means the data is valid. With ``partial`` only the fields present in
+    ``data`` are checked, as for an update.
+    """
+    errors = {}
+    for field in ('title', 'description'):
+        if data.get(field) is not None and not isinstance(data[field], str):
+            errors[field] = ['Must be a string']
+    if 'completed' in data and not isinstance(data['completed'], bool):
+        errors['completed'] = ['Must be a boolean']
+    if errors:
+        return errors
+
+    formdata = MultiDict(
+        (field, data[field]) for field in ('title', 'description') if data.get(field) is not None
+    )
+    form = TaskDataForm(formdata=formdata)
+    form.validate()
+    if partial:
+        return {field: messages for field, messages in form.errors.items() if field in data}
+    return form.errors
+
+
+class _FieldValue:
+    """Just enough of a bound field to run a field's validators against."""
+
+    def __init__(self):
+        self.data = None
+        self.raw_data = []
+        self.errors = []
+
+    def gettext(self, string):
+        return string
+
+    def ngettext(self, singular, plural, n):
+        return singular if n == 1 else plural
+
+
+def compile_task_validator():
+    """Return ``check(data)``, equivalent to ``validate_task_data(data)``.
+
+    The validator chains are read from TaskDataForm once and run against a
+    reused stand-in field, so no form is built per call. Bulk imports use it
+    to validate rows at the rate they are parsed.
+    """
+    chains = [(name, tuple(getattr(TaskDataForm, name).kwargs.get('validators', ())))
+              for name in ('title', 'description')]
+    field = _FieldValue()
+
+    def check(data):
+        errors = {}
+        for name in ('title', 'description'):
+            if data.get(name) is not None and not isinstance(data[name], str):
+                errors[name] = ['Must be a string']
+        if 'completed' in data and not isinstance(data['completed'], bool):
+            errors['completed'] = ['Must be a boolean']
+        if errors:
+            return errors
+
+        for name, validators in chains:
+            value = data.get(name)
+            field.data = value
+            field.raw_data = [] if value is None else [value]
+            field.errors = []
+            for validator in validators:
+                try:
+                    validator(None, field)
+                except StopValidation as exc:
+                    if exc.args and exc.args[0]:
+                        field.errors.append(exc.args[0])
+                    break
+                except ValidationError as exc:
+                    field.errors.append(exc.args[0])
+            if field.errors:
+                errors[name] = field.errors
+        return errors
+
+    return check
@@ -0,0 +1,151 @@
+"""Filters and sort orders for the task list (``/`` and ``/api/tasks``).
+
+Query parameters:
+
+- ``completed``: ``1`` for completed tasks only, ``0`` for open ones
+- ``created_after``/``created_before`` and ``updated_after``/``updated_before``:
+  ISO 8601 dates or date-times; ``after`` is inclusive, ``before`` exclusive
+- ``title_prefix``: titles starting with this text, matched case-sensitively
+- ``sort``: ``created_at`` (the default), ``updated_at`` or ``title``, with
+  ``order`` ``asc`` or ``desc``; dates default to newest first, titles to A-Z
+
+Every sort key has a ``(key, id)`` index on ``task`` and a
+``(completed, key, id)`` one for the completed filter, so a page is an index
+range read in sort order whatever the combination. The title prefix is
+turned into a range on ``title`` rather than a LIKE, which SQLite would only
+run on an index with NOCASE collation. With a range on another column than
+the sort key the planner either reads the sort index in order and checks the
+rows, or reads that column's range and sorts it; neither scans the table.
+"""
+from datetime import datetime
+
+from sqlalchemy import DateTime, literal
+
+SORT_KEYS = ('created_at', 'updated_at', 'title')
+# Newest first for dates, alphabetical for titles
+DESCENDING_BY_DEFAULT = {'created_at': True, 'updated_at': True, 'title': False}
+
+DATE_RANGES = {
+    'created_after': ('created_at', '>='),
+    'created_before': ('created_at', '<'),
+    'updated_after': ('updated_at', '>='),
+    'updated_before': ('updated_at', '<'),
+}
+
+TRUE_VALUES = {'1', 'true', 'yes'}
+FALSE_VALUES = {'0', 'false', 'no'}
+
+
+class InvalidListing(ValueError):
+    pass
+
+
+def _flag(value):
+    value = value.strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise InvalidListing('completed must be 1 or 0')
+
+
+def _date(name, value):
+    try:
+        return datetime.fromisoformat(value.strip())
+    except ValueError:
+        raise InvalidListing(f'{name} must be an ISO 8601 date or date and time')
+
+
+def prefix_bound(prefix):
+    """The smallest string greater than every string starting with ``prefix``.
+
+    None when there is no such string, i.e. the prefix is all U+10FFFF.
+    """
+    prefix = prefix.rstrip('\U0010ffff')
+    if not prefix:
+        return None
+    code = ord(prefix[-1]) + 1
+    if 0xD800 <= code <= 0xDFFF:
+        # Surrogates cannot be encoded; U+E000 is the next character
+        code = 0xE000
+    return prefix[:-1] + chr(code)
+
+
+class TaskListing:
+    """Which tasks a list shows and in which order."""
+
+    def __init__(self, completed=None, dates=None, title_prefix=None, sort='created_at',
+                 descending=None):
+        self.completed = completed
+        # {'created_after': datetime, ...}; see DATE_RANGES
+        self.dates = dates or {}
+        self.title_prefix = title_prefix or None
+        self.sort = sort
+        self.descending = DESCENDING_BY_DEFAULT[sort] if descending is None else descending
+
+    @classmethod
+    def from_args(cls, args):
+        """Read the listing from request arguments; raises ``InvalidListing``."""
+        completed = args.get('completed', '')
+        sort = args.get('sort') or 'created_at'
+        if sort not in SORT_KEYS:
+            raise InvalidListing(f'sort must be one of {", ".join(SORT_KEYS)}')
+        order = args.get('order') or None
+        if order not in (None, 'asc', 'desc'):
+            raise InvalidListing('order must be asc or desc')
+        return cls(
+            completed=_flag(completed) if completed.strip() else None,
+            dates={name: _date(name, args[name]) for name in DATE_RANGES if args.get(name)},
+            title_prefix=args.get('title_prefix'),
+            sort=sort,
+            descending=None if order is None else order == 'desc',
+        )
+
+    @property
+    def filtered(self):
+        return self.completed is not None or bool(self.dates) or self.title_prefix is not None
+
+    def criteria(self, table):
+        """WHERE clauses selecting the listed rows of ``table``."""
+        columns = table.c
+        clauses = []
+        if self.completed is not None:
+            # '= 1'/'= 0' rather than IS, which SQLite does not match against
+            # the leading column of an index
+            clauses.append(columns.completed == self.completed)
+        for name, value in self.dates.items():
+            column, operator = DATE_RANGES[name]
+            bound = literal(value, DateTime())
+            clauses.append(columns[column] >= bound if operator == '>=' else columns[column] < bound)
+        if self.title_prefix is not None:
+            clauses.append(columns.title >= self.title_prefix)
+            upper = prefix_bound(self.title_prefix)
+            if upper is not None:
+                clauses.append(columns.title < upper)
+        return clauses
+
+    def order(self, table):
+        """The unique sort key of ``table``, for ``keyset_paginate()``."""
+        return (table.c[self.sort], table.c.id)
+
+    def order_by(self, columns):
+        return [c.desc() if self.descending else c.asc() for c in columns]
+
+    def args(self):
+        """The listing as query arguments, for links to other pages of it."""
+        args = {}
+        if self.completed is not None:
+            args['completed'] = int(self.completed)
+        for name in DATE_RANGES:
+            if name in self.dates:
+                args[name] = self.dates[name].isoformat()
+        if self.title_prefix is not None:
+            args['title_prefix'] = self.title_prefix
+        if self.sort != 'created_at':
+            args['sort'] = self.sort
+        if self.descending != DESCENDING_BY_DEFAULT[self.sort]:
+            args['order'] = 'desc' if self.descending else 'asc'
+        return args
+
+    def key(self):
+        return tuple(sorted(self.args().items()))
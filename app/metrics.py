@@ -0,0 +1,239 @@
+"""Per-request timings and Prometheus metrics.
+
+While a request runs, SQL statements, template rendering and JSON
+serialization add their time to a ``RequestTimings`` in ``g``. The totals go
+back to the client in a ``Server-Timing`` header and are folded into
+per-endpoint histograms, which ``render()`` writes in the Prometheus text
+format. Metrics are kept per process.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from flask import before_render_template, g, has_app_context, request, template_rendered
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+
+from app import db
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, documentation, label_names):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for labels, value in values:
+            lines.append(f'{self.name}{_labels(self.label_names, labels)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, label_names, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        # labels -> [per-bucket counts, sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        with self._lock:
+            series = sorted((labels, (list(counts), total, count))
+                            for labels, (counts, total, count) in self._series.items())
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % float(bound)
+                lines.append(f'{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}')
+            le = 'le="+Inf"'
+            lines.append(f'{self.name}_bucket{_labels(self.label_names, labels, le)} {count}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, labels)} {total}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, labels)} {count}')
+        return lines
+
+
+ROUTE_LABELS = ('endpoint', 'method')
+
+requests_total = Counter('http_requests_total', 'Requests handled.', ROUTE_LABELS + ('status',))
+request_duration = Histogram('http_request_duration_seconds', 'Total request latency.',
+                             ROUTE_LABELS, LATENCY_BUCKETS)
+db_duration = Histogram('db_duration_seconds', 'Time spent in SQL per request.',
+                        ROUTE_LABELS, LATENCY_BUCKETS)
+db_queries = Histogram('db_queries_per_request', 'SQL statements executed per request.',
+                       ROUTE_LABELS, QUERY_COUNT_BUCKETS)
+render_duration = Histogram('template_render_duration_seconds', 'Template rendering time per request.',
+                            ROUTE_LABELS, LATENCY_BUCKETS)
+serialize_duration = Histogram('json_serialize_duration_seconds', 'JSON encoding time per request.',
+                               ROUTE_LABELS, LATENCY_BUCKETS)
+
+REGISTRY = [requests_total, request_duration, db_duration, db_queries, render_duration,
+            serialize_duration]
+
+
+class RequestTimings:
+    __slots__ = ('started', 'queries', 'db', 'render', 'serialize', 'status', '_render_started')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = self.render = self.serialize = 0.0
+        self.status = 500
+        self._render_started = None
+
+    def server_timing(self):
+        total = time.perf_counter() - self.started
+        return (f'db;dur={self.db * 1000:.2f};desc="{self.queries} queries", '
+                f'render;dur={self.render * 1000:.2f}, '
+                f'serialize;dur={self.serialize * 1000:.2f}, '
+                f'total;dur={total * 1000:.2f}')
+
+
+def current_timings():
+    """The ``RequestTimings`` of the request being handled, if any."""
+    if has_app_context():
+        return g.get('request_timings')
+    return None
+
+
+def add_serialize_time(seconds):
+    timings = current_timings()
+    if timings is not None:
+        timings.serialize += seconds
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """``jsonify`` that counts its encoding time as serialization."""
+
+    def response(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().response(*args, **kwargs)
+        finally:
+            add_serialize_time(time.perf_counter() - started)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = current_timings()
+    if timings is not None:
+        timings.queries += 1
+        timings.db += time.perf_counter() - context.query_started
+
+
+def _before_render(sender, template, context, **extra):
+    timings = current_timings()
+    if timings is not None:
+        timings._render_started = time.perf_counter()
+
+
+def _rendered(sender, template, context, **extra):
+    timings = current_timings()
+    if timings is not None and timings._render_started is not None:
+        timings.render += time.perf_counter() - timings._render_started
+        timings._render_started = None
+
+
+def instrument_engine(engine):
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def render():
+    return '\n'.join(line for metric in REGISTRY for line in metric.render()) + '\n'
+
+
+def reset():
+    for metric in REGISTRY:
+        metric.reset()
+
+
+def init_app(app):
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    with app.app_context():
+        engines = {db.engine, app.extensions['read_engine']}
+    for engine in engines:
+        instrument_engine(engine)
+    app.json = TimedJSONProvider(app)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+
+    @app.before_request
+    def start_request_timings():
+        g.request_timings = RequestTimings()
+
+    @app.after_request
+    def add_server_timing(response):
+        timings = g.get('request_timings')
+        if timings is not None:
+            timings.status = response.status_code
+            if app.config['METRICS_SERVER_TIMING']:
+                response.headers['Server-Timing'] = timings.server_timing()
+        return response
+
+    # Teardown runs once a streamed body is finished, so the histograms
+    # include the streaming time the header could not.
+    @app.teardown_request
+    def observe_request_timings(exc):
+        timings = g.pop('request_timings', None)
+        if timings is None:
+            return
+        labels = (request.endpoint or 'unmatched', request.method)
+        requests_total.inc(labels + (str(timings.status),))
+        request_duration.observe(labels, time.perf_counter() - timings.started)
+        db_duration.observe(labels, timings.db)
+        db_queries.observe(labels, timings.queries)
+        render_duration.observe(labels, timings.render)
+        serialize_duration.observe(labels, timings.serialize)
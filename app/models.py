@@ -2,12 +2,30 @@ from datetime import datetime
 from app import db
 
 class Task(db.Model):
+    __table_args__ = (
+        # Keyset pagination seeks on (sort key, id), with or without the
+        # completed filter; see app.listing. The archiver reads
+        # ix_task_completed_updated_at_id too.
+        db.Index('ix_task_created_at_id', 'created_at', 'id'),
+        db.Index('ix_task_updated_at_id', 'updated_at', 'id'),
+        db.Index('ix_task_title_id', 'title', 'id'),
+        db.Index('ix_task_completed_created_at_id', 'completed', 'created_at', 'id'),
+        db.Index('ix_task_completed_updated_at_id', 'completed', 'updated_at', 'id'),
+        db.Index('ix_task_completed_title_id', 'completed', 'title', 'id'),
+        # Delta sync reads rows written after a version; see app.sync.
+        db.Index('ix_task_version', 'version'),
+        # Archived tasks keep their ids, so ids must never be handed out twice.
+        {'sqlite_autoincrement': True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
     completed = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Value of the 'version' counter when the row was last written; see app.changes.
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     def __repr__(self):
         return f'<Task {self.id}: {self.title}>'
@@ -21,3 +39,74 @@ class Task(db.Model):
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
+
+
+class ArchivedTask(db.Model):
+    """Completed task moved out of the hot ``task`` table; see app.archive."""
+    __tablename__ = 'task_archive'
+    __table_args__ = (
+        # The same sort keys as the task table, for listings that include it
+        db.Index('ix_task_archive_created_at_id', 'created_at', 'id'),
+        db.Index('ix_task_archive_updated_at_id', 'updated_at', 'id'),
+        db.Index('ix_task_archive_title_id', 'title', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    completed = db.Column(db.Boolean, default=True)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ArchivedTask {self.id}: {self.title}>'
+
+
+class TaskDeletion(db.Model):
+    """Tombstone for a deleted task, read by the delta-sync endpoint."""
+    __tablename__ = 'task_deletion'
+
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False, index=True)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<TaskDeletion {self.task_id} v{self.version}>'
+
+
+class TaskEvent(db.Model):
+    """Committed task change, fanned out to Server-Sent Events streams.
+
+    Every worker process writes events in the same transaction as the change
+    and streams read them by id, so the table doubles as the broker.
+    """
+    __tablename__ = 'task_event'
+    # Ids must never be reused once old events are pruned.
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(16), nullable=False)
+    task_id = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<TaskEvent {self.id} {self.kind} {self.task_id}>'
+
+
+class TaskCounter(db.Model):
+    """Named counters kept in step with the task table.
+
+    ``version`` is bumped by every transaction that writes tasks.
+    """
+    __tablename__ = 'task_counter'
+
+    name = db.Column(db.String(32), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TaskCounter {self.name}={self.value}>'
@@ -0,0 +1,102 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import DateTime, tuple_
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, columns):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Malformed cursor')
+
+    if not isinstance(payload, list) or len(payload) != len(columns):
+        raise InvalidCursor('Malformed cursor')
+
+    values = []
+    for column, value in zip(columns, payload):
+        if isinstance(column.type, DateTime) and value is not None:
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise InvalidCursor('Malformed cursor')
+        values.append(value)
+    return values
+
+
+class KeysetPage:
+    """One page of a keyset (seek) paginated query.
+
+    Exposes ``items``, ``has_next``/``has_prev`` and the opaque
+    ``next_cursor``/``prev_cursor`` tokens to pass back as ``after`` and
+    ``before``. Unlike ``paginate()`` it never issues a COUNT or an OFFSET,
+    so every page costs the same index seek.
+    """
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def keyset_paginate(query, columns, per_page, after=None, before=None, descending=True,
+                    fetch=None):
+    """Seek to the page after (or before) a cursor on ``columns``.
+
+    ``columns`` must form a unique sort key (end it with the primary key) and
+    should be covered by an index in the same order. ``query`` may be a
+    ``Query`` or a ``select()``; pass ``fetch`` to execute the latter.
+    """
+    key = tuple_(*columns)
+    backwards = before is not None
+
+    if backwards:
+        bound = tuple_(*decode_cursor(before, columns))
+        query = query.where(key > bound if descending else key < bound)
+    elif after is not None:
+        bound = tuple_(*decode_cursor(after, columns))
+        query = query.where(key < bound if descending else key > bound)
+
+    # Walking backwards reads the index in the opposite direction and flips
+    # the rows afterwards.
+    reverse_scan = descending != backwards
+    query = query.order_by(*[c.desc() if reverse_scan else c.asc() for c in columns])
+
+    query = query.limit(per_page + 1)
+    rows = list(fetch(query) if fetch is not None else query.all())
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    def cursor_for(row):
+        return encode_cursor([getattr(row, c.key) for c in columns])
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if backwards or more:
+            next_cursor = cursor_for(rows[-1])
+        if after is not None or (backwards and more):
+            prev_cursor = cursor_for(rows[0])
+    return KeysetPage(rows, per_page, next_cursor, prev_cursor)
@@ -1,20 +1,101 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, abort, Response, stream_with_context
 from app.models import Task
 from app.forms import TaskForm
-from app import db
+from app.pagination import keyset_paginate, InvalidCursor
+from app.listing import TaskListing, InvalidListing
+from app.batch import apply_batch, BatchError
+from app.archive import restore_archived, select_with_archived
+from app.changes import read_counter, task_stats
+from app.conditional import conditional_response
+from app.cache import fragment_cache, gzip_cache, json_cache
+from app.writequeue import write_queue
+from app.storage import read_engine, read_session, retry_on_busy
+from app.serializers import json_bytes, json_dumps, json_response, select_tasks, task_row_dict
+from app.sync import changes_since
+from app.search import search_tasks
+from app.events import stream_events, latest_event_id
+from app.streaming import requested_stream_format, iter_ndjson, iter_json_array, STREAM_MIMETYPES
+from app.transfer import FORMATS, TransferError, format_for_mimetype, import_tasks, iter_export
+from app import db, metrics
 from datetime import datetime
+from markupsafe import Markup
+from sqlalchemy import select
+import io
+import zlib
 
 main_bp = Blueprint('main', __name__)
 
+# Newest first; backed by ix_task_created_at_id.
+TASK_ORDER = (Task.created_at, Task.id)
+tasks_table = Task.__table__
+
+def task_listing():
+    # Filters and sort order from the query string; see app.listing
+    try:
+        return TaskListing.from_args(request.args)
+    except InvalidListing as exc:
+        abort(400, description=str(exc))
+
+def task_page(per_page, listing, query=None, fetch=None, order=None):
+    if query is None:
+        query = select(Task).where(*listing.criteria(tasks_table))
+        fetch = lambda q: read_session().scalars(q).all()
+        order = listing.order(tasks_table)
+    try:
+        return keyset_paginate(
+            query, order, per_page,
+            after=request.args.get('after'), before=request.args.get('before'),
+            descending=listing.descending, fetch=fetch
+        )
+    except InvalidCursor:
+        abort(400)
+
+def listed_tasks(session, listing):
+    # Archived tasks are left out unless asked for with ?include_archived=1,
+    # and all of them are completed, so a list of open tasks never needs them
+    if request.args.get('include_archived', type=int) and listing.completed is not False:
+        return select_with_archived(session, listing)
+    return select_tasks(session).where(*listing.criteria(tasks_table)), listing.order(tasks_table)
+
+def api_page_size():
+    limit = request.args.get('limit', current_app.config['TASKS_PER_PAGE'], type=int)
+    return max(1, min(limit, current_app.config['API_MAX_PAGE_SIZE']))
+
 @main_bp.route('/')
 def index():
+    query = request.args.get('q', '').strip()
     page = request.args.get('page', 1, type=int)
-    tasks = Task.query.order_by(Task.created_at.desc()).paginate(
-        page=page, per_page=current_app.config['TASKS_PER_PAGE'], error_out=False
-    )
-    return render_template('index.html', tasks=tasks)
+    listing = task_listing()
+    # The task list only changes with the table version, so the rendered
+    # fragment is reused until the next write.
+    version, _ = read_counter(read_session(), 'version')
+    if query:
+        key = ('search', version, request.script_root, query, page)
+    else:
+        key = ('list', version, request.script_root, listing.key(),
+               request.args.get('after'), request.args.get('before'))
+    
+    task_list = fragment_cache.get(key)
+    if task_list is None:
+        task_list = render_task_list(query, page, listing)
+        fragment_cache.set(key, task_list)
+    return render_template('index.html', task_list=Markup(task_list), query=query, listing=listing)
+
+def render_task_list(query, page, listing):
+    if query:
+        results = search_tasks(
+            read_session(), query, page=page,
+            per_page=current_app.config['TASKS_PER_PAGE']
+        )
+        return render_template('_task_list.html', tasks=results, search=results,
+                               stats=task_stats(read_session()))
+    
+    tasks = task_page(current_app.config['TASKS_PER_PAGE'], listing)
+    return render_template('_task_list.html', tasks=tasks, listing=listing,
+                           stats=task_stats(read_session()))
 
 @main_bp.route('/add', methods=['GET', 'POST'])
+@retry_on_busy
 def add_task():
     form = TaskForm()
     if form.validate_on_submit():
@@ -30,6 +111,7 @@ def add_task():
     return render_template('add.html', form=form)
 
 @main_bp.route('/edit/<int:task_id>', methods=['GET', 'POST'])
+@retry_on_busy
 def edit_task(task_id):
     task = Task.query.get_or_404(task_id)
     form = TaskForm(obj=task)
@@ -46,6 +128,7 @@ def edit_task(task_id):
     return render_template('edit.html', form=form, task_id=task_id)
 
 @main_bp.route('/delete/<int:task_id>', methods=['POST'])
+@retry_on_busy
 def delete_task(task_id):
     task = Task.query.get_or_404(task_id)
     db.session.delete(task)
@@ -54,48 +137,233 @@ def delete_task(task_id):
     return redirect(url_for('main.index'))
 
 @main_bp.route('/toggle/<int:task_id>')
+@retry_on_busy
 def toggle_task(task_id):
-    task = Task.query.get_or_404(task_id)
-    task.completed = not task.completed
-    task.updated_at = datetime.utcnow()
-    db.session.commit()
+    completed = write_queue.run(toggle_completed, task_id)
     
-    status = 'completed' if task.completed else 'reopened'
+    status = 'completed' if completed else 'reopened'
     flash(f'Task {status} successfully!', 'success')
     return redirect(url_for('main.index'))
 
+# Writes handed to write_queue: they get a session, flush and never commit.
+def get_task_or_404(session, task_id):
+    # Touching an archived task brings it back to the task table
+    task = session.get(Task, task_id) or restore_archived(session, task_id)
+    if task is None:
+        abort(404)
+    return task
+
+def toggle_completed(session, task_id):
+    task = get_task_or_404(session, task_id)
+    task.completed = not task.completed
+    task.updated_at = datetime.utcnow()
+    session.flush()
+    return task.completed
+
+def update_task(session, task_id, data):
+    task = get_task_or_404(session, task_id)
+    if 'title' in data:
+        task.title = data['title']
+    if 'description' in data:
+        task.description = data['description']
+    if 'completed' in data:
+        task.completed = data['completed']
+    
+    task.updated_at = datetime.utcnow()
+    session.flush()
+    return task.to_dict()
+
 @main_bp.route('/api/tasks')
 def api_tasks():
-    tasks = Task.query.order_by(Task.created_at.desc()).all()
-    return jsonify([task.to_dict() for task in tasks])
+    # The table version changes on every write, so it validates any
+    # representation of the list; the query string and Accept header pick
+    # which representation.
+    version, modified = read_counter(read_session(), 'version')
+    variant = zlib.crc32(f'{request.full_path}|{request.accept_mimetypes}'.encode())
+    return conditional_response(
+        f'tasks-{version}-{variant:08x}', modified,
+        lambda: task_list_response(version, variant)
+    )
+
+def task_list_response(version, variant):
+    stream_format = requested_stream_format()
+    if stream_format:
+        return stream_tasks(stream_format)
+    
+    key = ('list', version, variant)
+    body = json_cache.get(key)
+    if body is None:
+        body = json_bytes(task_list())
+        json_cache.set(key, body)
+    return json_response(body)
+
+def task_list():
+    # Without paging parameters the full list is returned, as before.
+    session = read_session()
+    listing = task_listing()
+    query, order = listed_tasks(session, listing)
+    if not any(arg in request.args for arg in ('limit', 'after', 'before')):
+        rows = session.execute(query.order_by(*listing.order_by(order)))
+        return [task_row_dict(row) for row in rows]
+
+    page = task_page(api_page_size(), listing, query, fetch=lambda q: session.execute(q).all(), order=order)
+    return {
+        'tasks': [task_row_dict(row) for row in page.items],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor
+    }
+
+def stream_tasks(stream_format):
+    batch_size = current_app.config['API_STREAM_BATCH_SIZE']
+    session = read_session()
+    listing = task_listing()
+    query, order = listed_tasks(session, listing)
+    rows = session.execute(
+        query.order_by(*listing.order_by(order))
+        .execution_options(yield_per=batch_size)
+    )
+    encode = iter_ndjson if stream_format == 'ndjson' else iter_json_array
+    body = encode(rows, task_row_dict, json_dumps, batch_size)
+    return Response(stream_with_context(body), mimetype=STREAM_MIMETYPES[stream_format])
+
+@main_bp.route('/api/tasks/changes')
+def api_task_changes():
+    since = request.args.get('since', type=int)
+    return jsonify(changes_since(read_session(), since, current_app.config['SYNC_MAX_CHANGES']))
+
+@main_bp.route('/api/tasks/stats')
+def api_tasks_stats():
+    return jsonify(task_stats(read_session()))
+
+@main_bp.route('/api/tasks/search')
+def api_tasks_search():
+    results = search_tasks(
+        read_session(), request.args.get('q', ''),
+        page=request.args.get('page', 1, type=int),
+        per_page=api_page_size()
+    )
+    return jsonify({
+        'query': results.query,
+        'engine': results.engine,
+        'page': results.page,
+        'has_next': results.has_next,
+        'results': [result.to_dict() for result in results.results]
+    })
+
+@main_bp.route('/api/tasks/events')
+def api_task_events():
+    # EventSource resends the last id it saw when it reconnects
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = request.args.get('last_event_id', type=int)
+    if last_id is None:
+        last_id = latest_event_id(read_engine())
+    
+    body = stream_events(
+        read_engine(), last_id,
+        current_app.config['SSE_POLL_INTERVAL'],
+        current_app.config['SSE_HEARTBEAT_INTERVAL']
+    )
+    return Response(stream_with_context(body), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@main_bp.route('/api/tasks/batch', methods=['POST'])
+@retry_on_busy
+def api_tasks_batch():
+    data = request.get_json(silent=True)
+    items = data.get('operations') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({
+            'success': False,
+            'message': 'Expected a non-empty list of operations'
+        }), 400
+    if len(items) > current_app.config['API_MAX_BATCH_SIZE']:
+        return jsonify({
+            'success': False,
+            'message': f"At most {current_app.config['API_MAX_BATCH_SIZE']} operations per batch"
+        }), 413
+    
+    try:
+        results = apply_batch(items)
+    except BatchError as exc:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': 'Batch rejected; no changes were applied',
+            'results': exc.results
+        }), 400
+    
+    return jsonify({
+        'success': True,
+        'message': f'{len(results)} operations applied',
+        'results': results
+    })
+
+@main_bp.route('/api/tasks/import', methods=['POST'])
+def api_tasks_import():
+    # The body is read as a stream, never loaded whole; chunks commit as
+    # they fill, so this is not retried on a busy database
+    fmt = request.args.get('format') or format_for_mimetype(request.mimetype)
+    if fmt not in FORMATS:
+        return jsonify({
+            'success': False,
+            'message': 'Send text/csv or application/x-ndjson, or pass ?format=csv or ?format=jsonl'
+        }), 415
+    
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    try:
+        result = import_tasks(db.session, stream, fmt, current_app.config['IMPORT_CHUNK_SIZE'],
+                              current_app.config['IMPORT_MAX_REPORTED_ERRORS'])
+    except TransferError as exc:
+        return jsonify(dict(
+            exc.result.to_dict() if exc.result else {},
+            success=False, message=str(exc)
+        )), 400
+    
+    return jsonify(dict(
+        result.to_dict(), success=True,
+        message=f'{result.imported} tasks imported, {result.rejected} rejected'
+    ))
+
+@main_bp.route('/api/tasks/export')
+def api_tasks_export():
+    fmt = request.args.get('format', 'jsonl')
+    if fmt not in FORMATS:
+        abort(400)
+    body = iter_export(read_session(), fmt, current_app.config['EXPORT_BATCH_SIZE'],
+                       include_archived=request.args.get('include_archived', type=int))
+    return Response(stream_with_context(body), mimetype=FORMATS[fmt], headers={
+        'Content-Disposition': f'attachment; filename=tasks.{fmt}'
+    })
 
 @main_bp.route('/api/task/<int:task_id>', methods=['GET', 'PUT', 'DELETE'])
+@retry_on_busy
 def api_task_detail(task_id):
-    task = Task.query.get_or_404(task_id)
-    
     if request.method == 'GET':
-        return jsonify(task.to_dict())
+        row = read_session().execute(
+            select(Task.version, Task.updated_at).where(Task.id == task_id)
+        ).first()
+        if row is None:
+            abort(404)
+        return conditional_response(
+            f'task-{task_id}-{row.version}', row.updated_at,
+            lambda: task_detail_response(task_id, row.version)
+        )
     
-    elif request.method == 'PUT':
+    if request.method == 'PUT':
         data = request.get_json()
-        
-        if 'title' in data:
-            task.title = data['title']
-        if 'description' in data:
-            task.description = data['description']
-        if 'completed' in data:
-            task.completed = data['completed']
-        
-        task.updated_at = datetime.utcnow()
-        db.session.commit()
+        task = write_queue.run(update_task, task_id, data)
         
         return jsonify({
             'success': True,
             'message': 'Task updated successfully',
-            'task': task.to_dict()
+            'task': task
         })
     
     elif request.method == 'DELETE':
+        task = Task.query.get_or_404(task_id)
         db.session.delete(task)
         db.session.commit()
         
@@ -104,6 +372,30 @@ def api_task_detail(task_id):
             'message': 'Task deleted successfully'
         })
 
+def task_detail_response(task_id, version):
+    key = ('task', task_id, version)
+    body = json_cache.get(key)
+    if body is None:
+        session = read_session()
+        row = session.execute(select_tasks(session).where(Task.id == task_id)).one()
+        body = json_bytes(task_row_dict(row))
+        json_cache.set(key, body)
+    return json_response(body)
+
+@main_bp.route('/api/cache/stats')
+def api_cache_stats():
+    caches = {'json': json_cache, 'fragments': fragment_cache, 'gzip': gzip_cache}
+    name = request.args.get('cache', 'json')
+    if name not in caches:
+        abort(404)
+    return jsonify(caches[name].stats())
+
+@main_bp.route('/metrics')
+def prometheus_metrics():
+    if not current_app.config['METRICS_ENABLED']:
+        abort(404)
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @main_bp.app_errorhandler(404)
 def not_found_error(error):
     return render_template('error.html', error=404, message='Page not found'), 404
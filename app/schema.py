@@ -0,0 +1,135 @@
+import zlib
+from datetime import datetime
+
+from sqlalchemy import MetaData, inspect, select, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateColumn, CreateIndex, CreateTable
+
+from app import db
+
+# task_counter row holding the fingerprint of the schema the database was
+# last brought up to date with
+SCHEMA_VERSION_COUNTER = 'schema_version'
+
+
+def _add_missing_columns(conn, table):
+    existing = {column['name'] for column in inspect(conn).get_columns(table.name)}
+    for column in table.columns:
+        if column.name not in existing:
+            ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {ddl}')
+
+
+def _drop_retired_indexes(conn, table):
+    """Drop ``ix_`` indexes the model no longer declares.
+
+    Each one would otherwise go on costing every write to the table.
+    """
+    declared = {index.name for index in table.indexes}
+    for index in inspect(conn).get_indexes(table.name):
+        if index['name'].startswith('ix_') and index['name'] not in declared:
+            conn.exec_driver_sql(f'DROP INDEX {index["name"]}')
+
+
+def _lacks_autoincrement(conn, table):
+    """Whether the model wants SQLite AUTOINCREMENT and the table was made without it."""
+    if conn.dialect.name != 'sqlite' or not table.dialect_options['sqlite']['autoincrement']:
+        return False
+    ddl = conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,)
+    ).scalar()
+    return 'AUTOINCREMENT' not in ddl.upper()
+
+
+def _rebuild_table(conn, table):
+    """Recreate a SQLite table from its model, keeping every row and id.
+
+    SQLite cannot ALTER a table into AUTOINCREMENT. Indexes and triggers go
+    with the old table; the caller recreates them.
+    """
+    rebuilt = table.to_metadata(MetaData(), name=f'{table.name}_rebuild')
+    columns = ', '.join(column.name for column in table.columns)
+    conn.exec_driver_sql(f'DROP TABLE IF EXISTS {rebuilt.name}')
+    conn.execute(CreateTable(rebuilt))
+    conn.exec_driver_sql(f'INSERT INTO {rebuilt.name} ({columns}) SELECT {columns} FROM {table.name}')
+    conn.exec_driver_sql(f'DROP TABLE {table.name}')
+    conn.exec_driver_sql(f'ALTER TABLE {rebuilt.name} RENAME TO {table.name}')
+
+
+def schema_fingerprint(dialect):
+    """CRC32 of the DDL ``ensure_schema()`` would bring a database up to.
+
+    Any change to a model, index, the search index or the seeded counters
+    changes it.
+    """
+    from app.changes import COUNTER_SEEDS
+    from app.search import FTS_DDL
+
+    parts = []
+    for table in db.metadata.sorted_tables:
+        parts.append(str(CreateTable(table).compile(dialect=dialect)))
+        parts.extend(str(CreateIndex(index).compile(dialect=dialect))
+                     for index in sorted(table.indexes, key=lambda index: index.name))
+    parts.extend(FTS_DDL)
+    parts.extend(sorted(COUNTER_SEEDS))
+    # Kept within a signed 32-bit counter value
+    return zlib.crc32('\n'.join(parts).encode()) & 0x7fffffff
+
+
+def stored_fingerprint(engine):
+    """The fingerprint recorded by the last full check, or None."""
+    from app.changes import counters
+
+    try:
+        with engine.connect() as conn:
+            return conn.execute(
+                select(counters.c.value).where(counters.c.name == SCHEMA_VERSION_COUNTER)
+            ).scalar()
+    except DBAPIError:
+        # No task_counter table yet
+        return None
+
+
+def _store_fingerprint(conn, fingerprint):
+    from app.changes import counters
+
+    values = {'value': fingerprint, 'updated_at': datetime.utcnow()}
+    updated = conn.execute(
+        update(counters).where(counters.c.name == SCHEMA_VERSION_COUNTER).values(**values)
+    ).rowcount
+    if not updated:
+        conn.execute(counters.insert().values(name=SCHEMA_VERSION_COUNTER, **values))
+
+
+def ensure_schema(force=False):
+    """Create missing tables, columns and indexes, seed the counters and set
+    up the full-text index.
+
+    ``create_all()`` skips tables that already exist, so columns and indexes
+    added to a model after the table was first created are added here,
+    indexes removed from it are dropped, and a SQLite table that should use
+    AUTOINCREMENT is rebuilt with it. The check is skipped when the database
+    already records the current schema fingerprint, unless ``force`` is set.
+    Returns whether it ran.
+    """
+    from app.changes import seed_counters
+    from app.search import ensure_search_index
+
+    fingerprint = schema_fingerprint(db.engine.dialect)
+    if not force and stored_fingerprint(db.engine) == fingerprint:
+        return False
+
+    db.create_all()
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            _add_missing_columns(conn, table)
+            if _lacks_autoincrement(conn, table):
+                _rebuild_table(conn, table)
+            _drop_retired_indexes(conn, table)
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+        seed_counters(conn)
+    ensure_search_index(db.engine)
+    with db.engine.begin() as conn:
+        _store_fingerprint(conn, fingerprint)
+    return True
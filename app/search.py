@@ -0,0 +1,219 @@
+"""Full-text search over task titles and descriptions.
+
+On SQLite builds with FTS5 an external-content ``task_fts`` index is kept in
+step with ``task`` by triggers, so every write path (ORM, bulk statements,
+raw SQL) updates it in the same transaction. Elsewhere the same API falls
+back to a LIKE scan.
+"""
+import re
+from contextlib import contextmanager
+
+from flask import current_app
+from markupsafe import Markup, escape
+from sqlalchemy import case, column, func, literal_column, or_, select, table, text
+from sqlalchemy.exc import OperationalError
+
+from app.models import Task
+
+FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5(
+        title, description,
+        content='task', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_insert AFTER INSERT ON task BEGIN
+        INSERT INTO task_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_delete AFTER DELETE ON task BEGIN
+        INSERT INTO task_fts(task_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_update AFTER UPDATE OF title, description ON task BEGIN
+        INSERT INTO task_fts(task_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO task_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+]
+
+FTS_EXISTS = text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'task_fts'")
+
+# Title matches outrank description matches.
+TITLE_WEIGHT = 10.0
+
+# Placeholders around matches; replaced with <mark> after HTML escaping.
+MARK_OPEN, MARK_CLOSE = '\x02', '\x03'
+
+fts = table('task_fts', column('rowid'))
+fts_ref = literal_column('task_fts')
+
+
+def ensure_search_index(engine):
+    """Create the FTS5 index and triggers if possible; returns whether it exists."""
+    if engine.dialect.name != 'sqlite':
+        return False
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(FTS_EXISTS).first()
+            for statement in FTS_DDL:
+                conn.exec_driver_sql(statement)
+            if not exists:
+                conn.exec_driver_sql("INSERT INTO task_fts(task_fts) VALUES ('rebuild')")
+    except OperationalError:
+        # SQLite built without FTS5
+        return False
+    return True
+
+
+def fts_available(session):
+    cache = current_app.extensions.setdefault('task_search', {})
+    if 'fts5' not in cache:
+        cache['fts5'] = (session.get_bind().dialect.name == 'sqlite'
+                         and session.execute(FTS_EXISTS).first() is not None)
+    return cache['fts5']
+
+
+FTS_INSERT_TRIGGER = 'task_fts_insert'
+
+BULK_INDEX = text(
+    'INSERT INTO task_fts(rowid, title, description) '
+    'SELECT id, title, description FROM task WHERE id > :after_id'
+)
+
+
+@contextmanager
+def bulk_indexing(session, after_id):
+    """Index the tasks inserted in the block, ids above ``after_id``, at the end.
+
+    One INSERT ... SELECT indexes a chunk several times faster than the
+    trigger firing per row, so the trigger is dropped for the block and
+    recreated after it. DDL is transactional in SQLite: the block must run
+    in one transaction with the inserts, other connections never see the
+    table without its trigger, and a rollback restores it.
+    """
+    if not fts_available(session):
+        yield
+        return
+    conn = session.connection()
+    conn.exec_driver_sql(f'DROP TRIGGER IF EXISTS {FTS_INSERT_TRIGGER}')
+    yield
+    conn.execute(BULK_INDEX, {'after_id': after_id})
+    conn.exec_driver_sql(FTS_DDL[1])
+
+
+def _terms(query):
+    return [term for term in query.split() if term][:16]
+
+
+def _match_expression(terms):
+    # Quote every term so user input can never be parsed as FTS5 syntax, and
+    # let the last one match as a prefix for search-as-you-type.
+    quoted = ['"' + term.replace('"', '""') + '"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _render_marks(text):
+    if text is None:
+        return None
+    return Markup(str(escape(text)).replace(MARK_OPEN, '<mark>').replace(MARK_CLOSE, '</mark>'))
+
+
+def _highlight_terms(text, terms):
+    if text is None:
+        return None
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    return _render_marks(pattern.sub(lambda m: MARK_OPEN + m.group(0) + MARK_CLOSE, text))
+
+
+class SearchResult:
+    def __init__(self, task, rank, title, description):
+        self.task = task
+        self.rank = rank
+        self.title = title
+        self.description = description
+
+    def to_dict(self):
+        return {
+            'task': self.task.to_dict(),
+            'rank': self.rank,
+            'title_highlight': self.title,
+            'description_highlight': self.description,
+        }
+
+
+class SearchPage:
+    def __init__(self, query, results, page, per_page, has_next, engine):
+        self.query = query
+        self.results = results
+        self.page = page
+        self.per_page = per_page
+        self.has_next = has_next
+        self.engine = engine
+
+    @property
+    def items(self):
+        return [result.task for result in self.results]
+
+    @property
+    def highlights(self):
+        return {result.task.id: result for result in self.results}
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+
+def _fts_search(session, terms, limit, offset):
+    rank = func.bm25(fts_ref, TITLE_WEIGHT, 1.0)
+    stmt = (
+        select(
+            Task, rank.label('rank'),
+            func.highlight(fts_ref, 0, MARK_OPEN, MARK_CLOSE).label('title'),
+            func.highlight(fts_ref, 1, MARK_OPEN, MARK_CLOSE).label('description'),
+        )
+        .join(fts, fts.c.rowid == Task.id)
+        .where(fts_ref.op('MATCH')(_match_expression(terms)))
+        .order_by(rank, Task.id.desc())
+        .limit(limit).offset(offset)
+    )
+    return [
+        SearchResult(row.Task, row.rank, _render_marks(row.title), _render_marks(row.description))
+        for row in session.execute(stmt)
+    ]
+
+
+def _like_search(session, terms, limit, offset):
+    def like(col, term):
+        escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return col.ilike(f'%{escaped}%', escape='\\')
+
+    title_hits = sum(case((like(Task.title, term), 1), else_=0) for term in terms)
+    stmt = (
+        select(Task)
+        .where(*[or_(like(Task.title, term), like(Task.description, term)) for term in terms])
+        .order_by(title_hits.desc(), Task.created_at.desc(), Task.id.desc())
+        .limit(limit).offset(offset)
+    )
+    return [
+        SearchResult(task, None, _highlight_terms(task.title, terms),
+                     _highlight_terms(task.description, terms))
+        for task in session.scalars(stmt)
+    ]
+
+
+def search_tasks(session, query, page=1, per_page=10):
+    """Return a ranked ``SearchPage`` of tasks matching ``query``.
+
+    Highlights are HTML-safe ``Markup`` with matches wrapped in ``<mark>``.
+    """
+    terms = _terms(query or '')
+    page = max(page, 1)
+    if not terms:
+        return SearchPage(query, [], page, per_page, False, None)
+
+    engine = 'fts5' if fts_available(session) else 'like'
+    search = _fts_search if engine == 'fts5' else _like_search
+    results = search(session, terms, per_page + 1, (page - 1) * per_page)
+    return SearchPage(query, results[:per_page], page, per_page, len(results) > per_page, engine)
@@ -0,0 +1,130 @@
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import String, select, type_coerce
+
+from app.metrics import add_serialize_time
+from app.models import Task
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+TASK_FIELDS = ('id', 'title', 'description', 'completed', 'created_at', 'updated_at')
+
+
+def _task_columns(table):
+    return tuple(table.c[name] for name in TASK_FIELDS)
+
+
+def _sqlite_columns(columns):
+    # On SQLite, datetimes are read as their stored text and turned into ISO
+    # format by string surgery instead of being parsed into datetime objects.
+    return columns[:4] + tuple(
+        type_coerce(column, String).label(column.name) for column in columns[4:]
+    )
+
+
+# Column projection for the read APIs: plain row tuples serialize without
+# building ORM instances, identity-map entries or attribute instrumentation.
+TASK_COLUMNS = _task_columns(Task.__table__)
+SQLITE_TASK_COLUMNS = _sqlite_columns(TASK_COLUMNS)
+
+
+def select_tasks(session, table=None):
+    """Select the task columns; ``table`` defaults to task (see task_archive)."""
+    sqlite = session.get_bind().dialect.name == 'sqlite'
+    if table is None:
+        return select(*(SQLITE_TASK_COLUMNS if sqlite else TASK_COLUMNS))
+    columns = _task_columns(table)
+    return select(*(_sqlite_columns(columns) if sqlite else columns))
+
+
+def _isoformat(value):
+    if not isinstance(value, str):
+        return value.isoformat()
+    # SQLAlchemy stores 'YYYY-MM-DD HH:MM:SS.ffffff'; isoformat() swaps the
+    # space for a 'T' and drops a zero fraction. Other layouts are parsed.
+    if len(value) == 26 and value[19] == '.':
+        if value.endswith('.000000'):
+            return value[:10] + 'T' + value[11:19]
+        return value[:10] + 'T' + value[11:]
+    return datetime.fromisoformat(value).isoformat()
+
+
+def task_row_dict(row):
+    """Same dict as ``Task.to_dict()``, from a ``select_tasks()`` row."""
+    id, title, description, completed, created_at, updated_at = row
+    return {
+        'id': id,
+        'title': title,
+        'description': description,
+        'completed': completed,
+        'created_at': _isoformat(created_at),
+        'updated_at': _isoformat(updated_at)
+    }
+
+
+def _pretty():
+    provider = current_app.json
+    return (provider.compact is None and current_app.debug) or provider.compact is False
+
+
+def _orjson(obj):
+    out = orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+    # orjson writes non-ASCII characters and DEL raw where the stdlib encoder
+    # escapes them; any other output is byte-identical.
+    if out.isascii() and b'\x7f' not in out:
+        return out
+    return None
+
+
+def _fast_dumps(obj):
+    provider = current_app.json
+    if (orjson is None or not current_app.config['JSON_FAST_ENCODER']
+            or not (provider.ensure_ascii and provider.sort_keys)):
+        return None
+    try:
+        out = _orjson(obj)
+        if out is not None or not isinstance(obj, list):
+            return out
+        # Retry item by item, so one non-ASCII row does not send the whole
+        # list through the slow encoder.
+        dumps = provider.dumps
+        return b'[' + b','.join(
+            _orjson(item) or dumps(item, separators=(',', ':')).encode('ascii') for item in obj
+        ) + b']'
+    except TypeError:
+        return None
+
+
+def _json_bytes(obj):
+    if _pretty():
+        return (current_app.json.dumps(obj, indent=2) + '\n').encode('utf-8')
+    out = _fast_dumps(obj)
+    if out is not None:
+        return out + b'\n'
+    return (current_app.json.dumps(obj, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def json_bytes(obj):
+    """Encode ``obj`` exactly as ``jsonify(obj)`` would, as bytes."""
+    started = time.perf_counter()
+    try:
+        return _json_bytes(obj)
+    finally:
+        add_serialize_time(time.perf_counter() - started)
+
+
+def json_dumps(obj):
+    """Compact JSON text for streaming, matching ``json_bytes`` without the newline."""
+    out = _fast_dumps(obj)
+    if out is not None:
+        return out.decode('ascii')
+    return current_app.json.dumps(obj, separators=(',', ':'))
+
+
+def json_response(body):
+    return current_app.response_class(body, mimetype=current_app.json.mimetype)
@@ -0,0 +1,59 @@
+"""Helpers for running under a pre-fork server (see gunicorn.conf.py).
+
+The app is built and warmed up once in the server's master process, and the
+workers forked from it share the compiled templates and primed caches.
+Connections must not be shared, so the master closes its pools before
+forking and every worker drops the pool it inherited.
+"""
+import logging
+import time
+
+from app import db
+
+log = logging.getLogger(__name__)
+
+# Read-only pages requested by warm_up(); the first one is rendered HTML
+WARM_UP_PATHS = ('/', '/api/tasks', '/api/tasks/stats')
+
+
+def engines(app):
+    with app.app_context():
+        return set(db.engines.values()) | {app.extensions['read_engine']}
+
+
+def dispose_engines(app, close=True):
+    """Drop every pooled connection of the app's engines.
+
+    In a freshly forked worker pass ``close=False``: the inherited
+    connections belong to the parent and must be forgotten, not closed.
+    """
+    for engine in engines(app):
+        engine.dispose(close=close)
+
+
+def warm_up(app):
+    """Compile templates and prime the caches before workers are forked."""
+    from app import background, metrics
+    from app.cache import fragment_cache, json_cache
+    from app.templating import precompile_templates
+
+    started = time.perf_counter()
+    pages = app.config['APP_ROLE'] != 'api'
+    templates = precompile_templates(app) if pages else []
+
+    client = app.test_client()
+    for path in WARM_UP_PATHS if pages else WARM_UP_PATHS[1:]:
+        response = client.get(path)
+        if response.status_code != 200:
+            log.warning('Warm-up request to %s returned %s', path, response.status_code)
+        response.close()
+
+    # The requests started this process's periodic jobs and counted
+    # themselves; workers start their own jobs and metrics
+    background.stop_all(app, timeout=5)
+    metrics.reset()
+    json_cache.reset_stats()
+    fragment_cache.reset_stats()
+    dispose_engines(app)
+    log.info('Warmed up in %.1f ms (%d templates)', (time.perf_counter() - started) * 1000,
+             len(templates))
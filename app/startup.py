@@ -0,0 +1,25 @@
+"""Startup phase timings.
+
+``create_app()`` marks the end of each setup phase. The breakdown is kept in
+``app.extensions['startup_timings']``, logged, and printed by
+``flask tasks startup-timings``.
+"""
+import time
+
+
+class StartupTimer:
+    def __init__(self):
+        self.started = self._last = time.perf_counter()
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    @property
+    def total(self):
+        return self._last - self.started
+
+    def summary(self):
+        return ', '.join(f'{phase} {seconds * 1000:.1f} ms' for phase, seconds in self.phases)
@@ -0,0 +1,199 @@
+"""SQLite storage profiles and read/write routing.
+
+A profile is a set of pragmas applied to every new DBAPI connection. The
+'wal' profile lets readers run alongside a writer, trades per-commit fsyncs
+for per-checkpoint ones, and waits on locks instead of failing at once;
+background checkpoints keep the WAL from growing and keep checkpoint work
+out of request commits.
+
+Read-only handlers use ``read_session()``, bound to a separate engine and
+pool: a replica from ``SQLALCHEMY_READ_DATABASE_URI``, or the same SQLite
+file opened read-only. A burst of writers holding primary connections then
+cannot starve the readers.
+
+The ASGI front end (app.asgi) reads through an async engine over the same
+database; it hands each request's connection to ``read_session()`` in the
+WSGI environ.
+"""
+import logging
+import random
+import time
+from functools import wraps
+from urllib.parse import quote
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app import background, db
+
+log = logging.getLogger(__name__)
+
+SQLITE_PROFILES = {
+    # SQLite's own defaults
+    'default': {},
+    'wal': {
+        'journal_mode': 'WAL',
+        # Durable at checkpoint instead of at every commit; no corruption risk in WAL mode
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        # Negative values are KiB: 64 MiB page cache per connection
+        'cache_size': -64 * 1024,
+        'temp_store': 'MEMORY',
+        # Safety net only; background checkpoints normally keep the WAL small
+        'wal_autocheckpoint': 10000,
+    },
+}
+
+# Only meaningful on connections that write
+WRITER_PRAGMAS = ('journal_mode', 'wal_autocheckpoint')
+
+# WSGI environ key for a connection read_session() should use instead of
+# checking one out of the read engine's pool
+READ_BIND_ENVIRON_KEY = 'mini_task_manager.read_bind'
+
+BUSY_MESSAGES = ('database is locked', 'database is busy', 'database table is locked')
+
+
+def _is_memory(engine):
+    return engine.url.database in (None, '', ':memory:')
+
+
+def apply_profile(engine, pragmas):
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+
+def checkpoint(engine, mode):
+    with engine.connect() as conn:
+        busy, wal_pages, checkpointed = conn.exec_driver_sql(f'PRAGMA wal_checkpoint({mode})').one()
+    if busy:
+        log.info('WAL checkpoint (%s) blocked; %s of %s pages done', mode, checkpointed, wal_pages)
+    return busy, wal_pages, checkpointed
+
+
+def _read_only_url(engine):
+    path = quote(engine.url.database)
+    return make_url(f'sqlite:///file:{path}?mode=ro&uri=true')
+
+
+def _reader_pragmas(pragmas):
+    return {name: value for name, value in pragmas.items() if name not in WRITER_PRAGMAS}
+
+
+def _create_read_engine(app, engine, pragmas):
+    uri = app.config.get('SQLALCHEMY_READ_DATABASE_URI')
+    if not app.config['READ_ROUTING'] or (uri is None and (
+            engine.dialect.name != 'sqlite' or _is_memory(engine))):
+        return engine
+
+    read_engine = create_engine(uri or _read_only_url(engine),
+                                **app.config.get('SQLALCHEMY_READ_ENGINE_OPTIONS', {}))
+    if read_engine.dialect.name == 'sqlite':
+        apply_profile(read_engine, _reader_pragmas(pragmas))
+    return read_engine
+
+
+def create_async_read_engine(app):
+    """An asyncio engine over the read side, or None when there is no async
+    driver for it (aiosqlite for SQLite) or it cannot be shared.
+
+    ``ASYNC_READ_DATABASE_URI`` overrides the URL, which is otherwise the read
+    engine's with the driver swapped.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = app.extensions['read_engine']
+    url = app.config.get('ASYNC_READ_DATABASE_URI')
+    if url is None:
+        if engine.dialect.name != 'sqlite' or _is_memory(engine):
+            return None
+        url = engine.url.set(drivername='sqlite+aiosqlite')
+    try:
+        async_engine = create_async_engine(url)
+    except ImportError:
+        return None
+    if async_engine.dialect.name == 'sqlite':
+        apply_profile(async_engine.sync_engine, _reader_pragmas(app.extensions['sqlite_pragmas']))
+    return async_engine
+
+
+def init_app(app):
+    with app.app_context():
+        engine = db.engine
+
+    pragmas = {}
+    if engine.dialect.name == 'sqlite':
+        pragmas = dict(SQLITE_PROFILES[app.config['SQLITE_STORAGE_PROFILE']])
+        pragmas.update(app.config.get('SQLITE_PRAGMAS') or {})
+        if _is_memory(engine):
+            pragmas.pop('journal_mode', None)
+        apply_profile(engine, pragmas)
+
+    if str(pragmas.get('journal_mode', '')).upper() == 'WAL':
+        mode = app.config['SQLITE_CHECKPOINT_MODE']
+        background.schedule(app, 'wal-checkpoint', app.config['SQLITE_CHECKPOINT_INTERVAL'],
+                            lambda: checkpoint(db.engine, mode))
+
+    app.extensions['sqlite_pragmas'] = pragmas
+    app.extensions['read_engine'] = _create_read_engine(app, engine, pragmas)
+
+    @app.teardown_appcontext
+    def close_read_session(exc):
+        session = g.pop('read_session', None)
+        if session is not None:
+            session.close()
+
+
+def read_engine():
+    return current_app.extensions['read_engine']
+
+
+def read_session():
+    """Session for read-only work in the current app context.
+
+    It shares nothing with ``db.session``: writes made through it fail on a
+    read-only connection and are never committed.
+    """
+    if 'read_session' not in g:
+        bind = request.environ.get(READ_BIND_ENVIRON_KEY) if has_request_context() else None
+        g.read_session = Session(bind or read_engine(), autoflush=False)
+    return g.read_session
+
+
+def is_busy_error(exc):
+    return isinstance(exc, OperationalError) and any(
+        message in str(exc.orig).lower() for message in BUSY_MESSAGES
+    )
+
+
+def retry_on_busy(view):
+    """Re-run a write view when SQLite reports the database busy.
+
+    ``busy_timeout`` already waits for the write lock, but a deferred
+    transaction that read before another writer committed cannot upgrade to
+    a write and fails immediately; rolling back and starting over with a
+    fresh snapshot is the only fix. Views must not act before they commit
+    (flash, redirect) for this to be safe.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        retries = current_app.config['SQLITE_BUSY_RETRIES']
+        delay = current_app.config['SQLITE_BUSY_RETRY_DELAY']
+        for attempt in range(retries + 1):
+            try:
+                return view(*args, **kwargs)
+            except OperationalError as exc:
+                if attempt == retries or not is_busy_error(exc):
+                    raise
+                db.session.rollback()
+                # Exponential backoff with jitter so retrying writers spread out
+                time.sleep(delay * 2 ** attempt * (0.5 + random.random()))
+                log.info('Retrying %s after busy database (attempt %d)', view.__name__, attempt + 1)
+    return wrapper
@@ -0,0 +1,55 @@
+from flask import request
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+STREAM_MIMETYPES = {
+    'ndjson': NDJSON_MIMETYPE,
+    'json': 'application/json',
+}
+
+
+def requested_stream_format(req=None):
+    """Return 'ndjson', 'json' or None for a non-streaming response.
+
+    ``?format=ndjson`` (or an ``Accept: application/x-ndjson`` header) selects
+    newline-delimited JSON; ``?stream=1`` selects a chunked JSON array.
+    ``req`` defaults to the current request.
+    """
+    if req is None:
+        req = request
+    fmt = req.args.get('format')
+    if fmt in STREAM_MIMETYPES:
+        return fmt
+    if req.accept_mimetypes.best == NDJSON_MIMETYPE:
+        return 'ndjson'
+    if req.args.get('stream', type=int):
+        return 'json'
+    return None
+
+
+def _batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_ndjson(rows, serialize, dumps, batch_size):
+    # One chunk per batch keeps write calls down without holding more than
+    # ``batch_size`` encoded rows at a time.
+    for batch in _batches(rows, batch_size):
+        yield ''.join(dumps(serialize(row)) + '\n' for row in batch)
+
+
+def iter_json_array(rows, serialize, dumps, batch_size):
+    yield '['
+    first = True
+    for batch in _batches(rows, batch_size):
+        chunk = ','.join(dumps(serialize(row)) for row in batch)
+        yield chunk if first else ',' + chunk
+        first = False
+    yield ']\n'
@@ -0,0 +1,68 @@
+from sqlalchemy import delete, func, select, update
+
+from app.changes import counters, deletions, read_counter
+from app.models import Task
+
+
+def changes_since(session, since, limit):
+    """Return the task writes committed after version ``since``.
+
+    The result carries the new ``cursor`` to pass back as ``since``, the
+    tasks created or updated since the old cursor and the ids deleted since
+    then. When the client has no cursor, is further behind than ``limit``
+    changes, or its tombstones were already pruned, a full snapshot is sent
+    instead (``full`` is true) and the client should replace its state.
+
+    Versions are assigned while the writer holds the database write lock, so
+    they follow commit order; reading the cursor and the rows in one
+    transaction means no write can fall between two syncs.
+    """
+    version, _ = read_counter(session, 'version')
+    horizon, _ = read_counter(session, 'tombstone_horizon')
+
+    if since is not None and horizon <= since <= version:
+        tasks = session.scalars(
+            select(Task).where(Task.version > since)
+            .order_by(Task.version, Task.id).limit(limit + 1)
+        ).all()
+        deleted = session.scalars(
+            select(deletions.c.task_id).where(deletions.c.version > since)
+            .order_by(deletions.c.version).limit(limit + 1)
+        ).all()
+        if len(tasks) <= limit and len(deleted) <= limit:
+            return {
+                'cursor': version,
+                'full': False,
+                'tasks': [task.to_dict() for task in tasks],
+                'deleted': sorted(set(deleted)),
+            }
+
+    tasks = session.scalars(select(Task).order_by(Task.created_at.desc(), Task.id.desc()))
+    return {
+        'cursor': version,
+        'full': True,
+        'tasks': [task.to_dict() for task in tasks],
+        'deleted': [],
+    }
+
+
+def prune_tombstones(session, older_than):
+    """Delete tombstones written before ``older_than``; returns how many.
+
+    Clients whose cursor predates the pruned tombstones get a full snapshot
+    on their next sync.
+    """
+    pruned_version = session.scalar(
+        select(func.max(deletions.c.version)).where(deletions.c.deleted_at < older_than)
+    )
+    if pruned_version is None:
+        return 0
+
+    result = session.execute(delete(deletions).where(deletions.c.version <= pruned_version))
+    horizon, _ = read_counter(session, 'tombstone_horizon')
+    session.execute(
+        update(counters).where(counters.c.name == 'tombstone_horizon')
+        .values(value=max(horizon, pruned_version))
+    )
+    session.commit()
+    return result.rowcount
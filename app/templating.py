@@ -0,0 +1,24 @@
+import os
+
+from jinja2 import FileSystemBytecodeCache
+
+
+def init_app(app):
+    """Keep compiled templates on disk, shared by every worker process.
+
+    A cold worker then loads template bytecode instead of parsing and
+    compiling the sources again.
+    """
+    if not app.config['JINJA_BYTECODE_CACHE']:
+        return
+    directory = app.config['JINJA_BYTECODE_CACHE_DIR'] or os.path.join(app.instance_path, 'jinja-cache')
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+
+def precompile_templates(app):
+    """Compile the app's own templates now, filling the bytecode cache."""
+    names = [name for name in app.jinja_loader.list_templates() if name.endswith('.html')]
+    for name in names:
+        app.jinja_env.get_template(name)
+    return names
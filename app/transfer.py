@@ -0,0 +1,287 @@
+"""Bulk import and export of tasks as CSV or JSON Lines.
+
+Both directions stream, so memory use does not grow with the file:
+``import_tasks()`` parses one record at a time and writes every
+``chunk_size`` valid rows with a single executemany INSERT in a transaction
+of its own, and ``iter_export()`` reads rows from a server-side cursor and
+yields them in encoded batches.
+
+Rows are checked against the TaskForm rules; invalid rows are skipped and
+reported by line number. Ids are not imported, rows get new ones in file
+order, but ``created_at`` and ``updated_at`` are kept when the file has
+them, so an export can be restored.
+
+Each chunk is bookkept like any other bulk write: it bumps the table
+version, adjusts the counters and is published to the change subscribers.
+Instead of one event per row it records a single ``reset`` event, which
+makes live pages reload.
+"""
+import csv
+import io
+import json
+import time
+from datetime import datetime
+
+from sqlalchemy import func, insert, select
+
+from app.archive import select_with_archived
+from app.changes import adjust_counters, bump_version, record_bulk_writes
+from app.events import record_events
+from app.forms import compile_task_validator
+from app.models import Task
+from app.search import bulk_indexing
+from app.serializers import json_dumps, select_tasks, task_row_dict
+from app.streaming import NDJSON_MIMETYPE, iter_ndjson
+
+tasks = Task.__table__
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': NDJSON_MIMETYPE,
+}
+
+EXTENSIONS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+EXPORT_FIELDS = ('id', 'title', 'description', 'completed', 'created_at', 'updated_at')
+IMPORT_FIELDS = ('title', 'description', 'completed', 'created_at', 'updated_at')
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+FALSE_VALUES = {'', '0', 'false', 'f', 'no', 'n'}
+
+
+class TransferError(Exception):
+    """The input cannot be read any further.
+
+    Chunks before the failure stay committed; ``result`` says how many rows
+    that was.
+    """
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+class ImportResult:
+    def __init__(self, max_errors):
+        self.imported = 0
+        self.rejected = 0
+        # The first ``max_errors`` rejected rows as {'line': n, 'errors': {...}}
+        self.errors = []
+        self.max_errors = max_errors
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        return self.imported / self.elapsed if self.elapsed else 0.0
+
+    def reject(self, line, errors):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def to_dict(self):
+        return {
+            'imported': self.imported,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'seconds': round(self.elapsed, 3),
+        }
+
+
+def format_for_name(name):
+    """Guess the format from a file name; None when the extension is unknown."""
+    for extension, fmt in EXTENSIONS.items():
+        if name.lower().endswith(extension):
+            return fmt
+    return None
+
+
+def format_for_mimetype(mimetype):
+    for fmt, known in FORMATS.items():
+        if mimetype == known:
+            return fmt
+    return None
+
+
+def _csv_records(stream):
+    reader = csv.DictReader(stream)
+    if reader.fieldnames is None:
+        return
+    if 'title' not in reader.fieldnames:
+        raise TransferError('The CSV header has no title column')
+    for row in reader:
+        errors = {}
+        record = {'title': row['title'], 'description': row.get('description') or None}
+        completed = (row.get('completed') or '').strip().lower()
+        if completed in TRUE_VALUES:
+            record['completed'] = True
+        elif completed in FALSE_VALUES:
+            record['completed'] = False
+        else:
+            errors['completed'] = ['Must be a boolean']
+        for name in ('created_at', 'updated_at'):
+            if row.get(name):
+                record[name] = row[name]
+        yield reader.line_num, record, errors
+
+
+def _jsonl_records(stream):
+    for line, text in enumerate(stream, 1):
+        if not text.strip():
+            continue
+        try:
+            item = json.loads(text)
+        except ValueError:
+            yield line, None, {'record': ['Invalid JSON']}
+            continue
+        if not isinstance(item, dict):
+            yield line, None, {'record': ['Must be a JSON object']}
+            continue
+        yield line, {field: item[field] for field in IMPORT_FIELDS if field in item}, {}
+
+
+READERS = {'csv': _csv_records, 'jsonl': _jsonl_records}
+
+
+def _parse_dates(record, errors):
+    for name in ('created_at', 'updated_at'):
+        value = record.get(name)
+        if value is None:
+            continue
+        try:
+            record[name] = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            errors[name] = ['Must be an ISO 8601 date and time']
+
+
+INSERT_COLUMNS = ('title', 'description', 'completed', 'created_at', 'updated_at', 'version')
+
+SQLITE_INSERT = (f'INSERT INTO task ({", ".join(INSERT_COLUMNS)}) '
+                 f'VALUES ({", ".join("?" for _ in INSERT_COLUMNS)})')
+
+
+def _insert_sqlite(conn, rows):
+    # The driver's executemany, with values already in the form SQLAlchemy
+    # stores them, skips the per-row parameter processing that otherwise
+    # costs as much as the INSERT itself.
+    to_db = tasks.c.created_at.type.dialect_impl(conn.dialect).bind_processor(conn.dialect)
+    stored = {}
+
+    def date(value):
+        if value not in stored:
+            stored[value] = to_db(value)
+        return stored[value]
+
+    conn.exec_driver_sql(SQLITE_INSERT, [
+        (row['title'], row['description'], int(row['completed']),
+         date(row['created_at']), date(row['updated_at']), row['version'])
+        for row in rows
+    ])
+
+
+def _write_chunk(session, rows):
+    # The version bump comes first: it takes the write lock, so no other
+    # writer can insert between reading the highest id and the INSERT, and
+    # a deferred transaction never has to upgrade from a read.
+    version = bump_version(session)
+    conn = session.connection()
+    last_id = conn.execute(select(func.max(tasks.c.id))).scalar() or 0
+
+    now = datetime.utcnow()
+    for row in rows:
+        if row['created_at'] is None:
+            row['created_at'] = now
+        if row['updated_at'] is None:
+            row['updated_at'] = row['created_at']
+        row['version'] = version
+    with bulk_indexing(session, last_id):
+        if conn.dialect.name == 'sqlite':
+            _insert_sqlite(conn, rows)
+        else:
+            conn.execute(insert(tasks), rows)
+
+    adjust_counters(session, total=len(rows), completed=sum(row['completed'] for row in rows))
+    record_events(session, [('reset', 0, {})])
+    record_bulk_writes(session, created=conn.execute(
+        select(tasks.c.id).where(tasks.c.id > last_id)
+    ).scalars().all())
+    session.commit()
+
+
+def import_tasks(session, stream, fmt, chunk_size, max_errors=100, progress=None):
+    """Import tasks from the text ``stream``; returns an ``ImportResult``.
+
+    ``progress(result)`` is called after every committed chunk.
+    """
+    check = compile_task_validator()
+    result = ImportResult(max_errors)
+    chunk = []
+    try:
+        for line, record, errors in READERS[fmt](stream):
+            if not errors:
+                errors = check(record)
+            if not errors:
+                _parse_dates(record, errors)
+            if errors:
+                result.reject(line, errors)
+                continue
+
+            chunk.append({
+                'title': record['title'],
+                'description': record.get('description'),
+                'completed': record.get('completed', False),
+                'created_at': record.get('created_at'),
+                'updated_at': record.get('updated_at'),
+            })
+            if len(chunk) >= chunk_size:
+                _write_chunk(session, chunk)
+                result.imported += len(chunk)
+                chunk = []
+                if progress:
+                    progress(result)
+    except TransferError as exc:
+        exc.result = result
+        raise
+    except (csv.Error, UnicodeDecodeError) as exc:
+        session.rollback()
+        raise TransferError(f'Unreadable input after {result.imported} imported rows: {exc}', result)
+
+    if chunk:
+        _write_chunk(session, chunk)
+        result.imported += len(chunk)
+        if progress:
+            progress(result)
+    return result
+
+
+def _iter_csv(rows, batch_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for batch in rows.partitions(batch_size):
+        for row in batch:
+            task = task_row_dict(row)
+            writer.writerow((task['id'], task['title'], task['description'] or '',
+                             'true' if task['completed'] else 'false',
+                             task['created_at'], task['updated_at']))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_export(session, fmt, batch_size, include_archived=False):
+    """Yield every task, oldest id first, as chunks of CSV or JSON Lines text."""
+    if include_archived:
+        query, (_, id_column) = select_with_archived(session)
+    else:
+        query, id_column = select_tasks(session), Task.id
+    rows = session.execute(query.order_by(id_column).execution_options(yield_per=batch_size))
+    if fmt == 'csv':
+        return _iter_csv(rows, batch_size)
+    return iter_ndjson(rows, task_row_dict, json_dumps, batch_size)
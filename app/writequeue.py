@@ -0,0 +1,126 @@
+"""Group commit for small, frequent writes.
+
+With write-behind enabled, ``write_queue.run()`` hands a write to one writer
+thread per process instead of committing it on the request thread. The
+writer takes everything that arrives within a short window, applies each
+write in its own savepoint of a single transaction and commits once, so the
+whole group shares one commit. Every caller still gets its own result, or
+its own exception, after that commit.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from app import db
+
+log = logging.getLogger(__name__)
+
+
+class WriteQueue:
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.window = 0.002
+        self.max_batch = 64
+        self.timeout = None
+        self._lock = threading.Lock()
+        self._pid = None
+        self._pending = None
+        self.reset_stats()
+
+    def init_app(self, app, prefix):
+        self.app = app
+        self.enabled = app.config[f'{prefix}_ENABLED']
+        self.window = app.config[f'{prefix}_WINDOW_MS'] / 1000
+        self.max_batch = app.config[f'{prefix}_MAX_BATCH']
+        self.timeout = app.config[f'{prefix}_TIMEOUT']
+
+    def reset_stats(self):
+        self.batches = self.writes = 0
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'batches': self.batches,
+            'writes': self.writes,
+        }
+
+    def run(self, func, *args):
+        """Apply ``func(session, *args)``, commit and return its result.
+
+        ``func`` must only flush, never commit. Exceptions it raises, and a
+        failed commit, are re-raised here.
+        """
+        if not self.enabled:
+            result = func(db.session, *args)
+            db.session.commit()
+            return result
+        future = Future()
+        self._queue().put((func, args, future))
+        return future.result(self.timeout)
+
+    def _queue(self):
+        # One writer per process; a queue or thread inherited across fork is
+        # replaced, like background.PeriodicJob.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    pending = queue.SimpleQueue()
+                    threading.Thread(target=self._write_loop, args=(pending,),
+                                     name='write-queue', daemon=True).start()
+                    self._pending, self._pid = pending, os.getpid()
+        return self._pending
+
+    def _write_loop(self, pending):
+        while True:
+            batch = [pending.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._apply(batch)
+            except Exception as exc:
+                log.exception('Write batch of %d failed', len(batch))
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    def _apply(self, batch):
+        with self.app.app_context():
+            session = db.session
+            try:
+                if session.get_bind().dialect.name == 'sqlite':
+                    # Take the write lock up front; savepoints must also sit
+                    # inside a transaction, or releasing the first one commits.
+                    session.connection().exec_driver_sql('BEGIN IMMEDIATE')
+                outcomes = []
+                for func, args, future in batch:
+                    try:
+                        with session.begin_nested():
+                            outcomes.append((future, func(session, *args), None))
+                    except Exception as exc:
+                        outcomes.append((future, None, exc))
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+
+        self.batches += 1
+        self.writes += len(batch)
+        for future, result, exc in outcomes:
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+
+
+write_queue = WriteQueue()
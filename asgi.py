@@ -0,0 +1,8 @@
+"""ASGI entry point, mainly for the JSON API: ``uvicorn asgi:app``.
+
+See app/asgi.py for what runs on the event loop and what on threads.
+"""
+from app import create_app
+from app.asgi import AsyncAPI
+
+app = AsyncAPI(create_app())
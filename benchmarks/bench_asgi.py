@@ -0,0 +1,216 @@
+"""Compare the sync (gunicorn, gthread) and async (uvicorn, asgi.py) API paths.
+
+Both servers run as one worker process against a copy of a seeded database.
+Each run opens ``--slow-clients`` idle SSE streams first, the way browsers
+keep /api/tasks/events open, then drives read requests over HTTP keep-alive
+connections from ``--concurrency`` threads:
+
+    python benchmarks/bench_asgi.py --size 10k --slow-clients 0,32 --output asgi.json
+
+With the sync server every open stream holds one of its threads, so once
+the streams outnumber them, requests queue and time out. Requests slower
+than ``--timeout`` count as errors, and a run stops after ``--max-errors``.
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_routes import git_revision, percentile, seeded_database
+from seed_tasks import SIZES, parse_size
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    'sync': lambda port, threads: [sys.executable, '-m', 'gunicorn', '--workers', '1',
+                                   '--threads', str(threads), '--bind', f'127.0.0.1:{port}'],
+    'async': lambda port, threads: [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port),
+                                    '--log-level', 'warning'],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, database, threads):
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{database}', ASYNC_API_THREADS=str(threads),
+               PYTHONPATH=ROOT)
+    process = subprocess.Popen(SERVERS[kind](port, threads), cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/tasks/stats')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f'{kind} server did not start')
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def open_streams(port, count):
+    """Open ``count`` SSE streams that are then left idle."""
+    streams = []
+    for _ in range(count):
+        sock = socket.create_connection(('127.0.0.1', port))
+        sock.sendall(b'GET /api/tasks/events HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n\r\n')
+        streams.append(sock)
+    return streams
+
+
+def task_ids(database, count):
+    import sqlite3
+
+    with sqlite3.connect(database) as conn:
+        ids = [row[0] for row in conn.execute('SELECT id FROM task ORDER BY random() LIMIT ?', (count,))]
+    return ids
+
+
+def request_paths(ids, count):
+    rng = random.Random(0)
+    paths = ['/api/tasks?limit=20', '/api/tasks/stats', '/api/tasks/search?q=report&limit=10']
+    return [rng.choice(paths) if i % 2 else f'/api/task/{rng.choice(ids)}' for i in range(count)]
+
+
+def run_load(port, paths, concurrency, timeout, max_errors):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    counter = itertools.count()
+
+    def worker():
+        nonlocal errors
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+        for i in counter:
+            if i >= len(paths) or errors >= max_errors:
+                break
+            started = time.perf_counter()
+            try:
+                conn.request('GET', paths[i])
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except OSError:
+                ok = False
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+        conn.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    stats = {'requests': len(latencies) + errors, 'errors': errors,
+             'throughput': len(latencies) / elapsed}
+    for pct in (50, 95, 99):
+        stats[f'p{pct}_ms'] = percentile(latencies, pct) * 1000 if latencies else None
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=parse_size, default='10k',
+                        help='seeded row count, or one of: ' + ', '.join(SIZES))
+    parser.add_argument('--servers', default='sync,async', help='comma-separated subset of: sync,async')
+    parser.add_argument('--threads', type=int, default=8,
+                        help='gunicorn threads, and the ASGI thread pool size')
+    parser.add_argument('--concurrency', type=int, default=16, help='client threads sending requests')
+    parser.add_argument('--slow-clients', default='0,32',
+                        help='comma-separated counts of idle SSE streams to hold open')
+    parser.add_argument('--requests', type=int, default=2000, help='requests per run')
+    parser.add_argument('--timeout', type=float, default=5.0, help='seconds before a request fails')
+    parser.add_argument('--max-errors', type=int, default=50, help='errors that end a run early')
+    parser.add_argument('--data-dir', default=os.path.join(ROOT, 'benchmarks', '.data'))
+    parser.add_argument('--output', help='write results as JSON')
+    args = parser.parse_args()
+
+    source = seeded_database(args.data_dir, args.size)
+    results = {
+        'meta': {
+            'rows': args.size,
+            'requests': args.requests,
+            'threads': args.threads,
+            'concurrency': args.concurrency,
+            'started_at': datetime.utcnow().isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'scenarios': {},
+    }
+    paths = request_paths(task_ids(source, 1000), args.requests)
+
+    print(f'{args.size} rows, {args.requests} requests from {args.concurrency} clients, '
+          f'{args.threads} server threads')
+    print(f"  {'server':6} {'streams':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for kind in args.servers.split(','):
+            database = os.path.join(tmp, f'{kind}.db')
+            shutil.copyfile(source, database)
+            process, port = start_server(kind, database, args.threads)
+            try:
+                run_load(port, paths[:100], args.concurrency, args.timeout, args.max_errors)
+                for slow in (int(count) for count in args.slow_clients.split(',')):
+                    streams = open_streams(port, slow)
+                    time.sleep(0.5)
+                    try:
+                        stats = run_load(port, paths, args.concurrency, args.timeout, args.max_errors)
+                    finally:
+                        for sock in streams:
+                            sock.close()
+                    results['scenarios'][f'{kind}@{slow}'] = stats
+                    p = {key: f'{stats[key]:9.2f}' if stats[key] is not None else f"{'-':>9}"
+                         for key in ('p50_ms', 'p95_ms', 'p99_ms')}
+                    print(f"  {kind:6} {slow:7} {stats['throughput']:9.0f} {p['p50_ms']} "
+                          f"{p['p95_ms']} {p['p99_ms']} {stats['errors']:6}")
+                    # Let the server notice the closed streams
+                    time.sleep(args.timeout if kind == 'sync' and slow else 0.5)
+            finally:
+                stop_server(process)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,409 @@
+"""Load and latency benchmark for every ``main_bp`` route.
+
+Requests are driven in-process straight through the WSGI app, with no HTTP
+server or network, from a pool of threads. Each scenario reports throughput
+and p50/p95/p99 latency per thread count. Runs use a copy of a seeded
+database (see seed_tasks.py), built once per size and kept under
+``--data-dir``.
+
+    python benchmarks/bench_routes.py --size 100k --threads 1,8 --output results.json
+    python benchmarks/bench_routes.py --size 100k --baseline benchmarks/baselines/100k.json
+
+With ``--baseline``, scenarios whose p95 latency or throughput is worse
+than the baseline by more than ``--tolerance`` are reported and the exit
+status is 1. A results file can be stored as a new baseline as-is.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.test import EnvironBuilder
+
+from app import create_app, db
+from app.batch import apply_batch
+from app.changes import read_counter
+from app.events import latest_event_id
+from app.models import Task
+from app.pagination import encode_cursor
+from config import Config
+from seed_tasks import SIZES, build_database, parse_size
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.data')
+
+SCENARIOS = {}
+
+
+class Scenario:
+    def __init__(self, name, build, stream=False, full_scan=False):
+        self.name = name
+        self.build = build
+        # Read only the first chunk of the body (endless SSE streams)
+        self.stream = stream
+        # Reads every row; skipped on large databases unless asked for
+        self.full_scan = full_scan
+
+
+def scenario(name, **options):
+    def register(build):
+        SCENARIOS[name] = Scenario(name, build, **options)
+        return build
+    return register
+
+
+class Targets:
+    """Ids and cursors the request specs point at, read from the database."""
+
+    def __init__(self, app, seed=0):
+        self.app = app
+        self.rng = random.Random(seed)
+        with app.app_context():
+            self.ids = list(db.session.scalars(db.select(Task.id)))
+            newest = db.session.execute(
+                db.select(Task.created_at, Task.id)
+                .order_by(Task.created_at.desc(), Task.id.desc()).offset(9).limit(1)
+            ).first()
+            self.cursor = encode_cursor(list(newest)) if newest else None
+
+    def version(self):
+        with self.app.app_context():
+            return read_counter(db.session, 'version')[0]
+
+    def event_id(self):
+        with self.app.app_context():
+            return latest_event_id(db.engine)
+
+    def sample(self, n):
+        return [self.rng.choice(self.ids) for _ in range(n)]
+
+    def fresh_ids(self, n):
+        """Create ``n`` throwaway tasks for scenarios that delete."""
+        ids = []
+        with self.app.app_context():
+            for start in range(0, n, 1000):
+                results = apply_batch([{'op': 'create', 'title': f'Bench task {i}'}
+                                       for i in range(start, min(n, start + 1000))])
+                ids.extend(result['id'] for result in results)
+        return ids
+
+
+def form_task(i):
+    return {'title': f'Bench task {i}', 'description': 'Created by bench_routes.py',
+            'completed': 'y' if i % 2 else ''}
+
+
+@scenario('index')
+def _index(targets, n):
+    return [{'path': '/'}] * n
+
+
+@scenario('index_next_page')
+def _index_next_page(targets, n):
+    return [{'path': '/', 'query_string': {'after': targets.cursor}}] * n
+
+
+@scenario('index_search')
+def _index_search(targets, n):
+    return [{'path': '/', 'query_string': {'q': word}}
+            for word in itertools.islice(itertools.cycle(['report', 'review budget', 'deplo']), n)]
+
+
+@scenario('add_form')
+def _add_form(targets, n):
+    return [{'path': '/add'}] * n
+
+
+@scenario('add_task')
+def _add_task(targets, n):
+    return [{'path': '/add', 'method': 'POST', 'data': form_task(i)} for i in range(n)]
+
+
+@scenario('edit_form')
+def _edit_form(targets, n):
+    return [{'path': f'/edit/{task_id}'} for task_id in targets.sample(n)]
+
+
+@scenario('edit_task')
+def _edit_task(targets, n):
+    return [{'path': f'/edit/{task_id}', 'method': 'POST', 'data': form_task(i)}
+            for i, task_id in enumerate(targets.sample(n))]
+
+
+@scenario('toggle_task')
+def _toggle_task(targets, n):
+    return [{'path': f'/toggle/{task_id}'} for task_id in targets.sample(n)]
+
+
+@scenario('delete_task')
+def _delete_task(targets, n):
+    return [{'path': f'/delete/{task_id}', 'method': 'POST'} for task_id in targets.fresh_ids(n)]
+
+
+@scenario('api_tasks', full_scan=True)
+def _api_tasks(targets, n):
+    return [{'path': '/api/tasks'}] * n
+
+
+@scenario('api_tasks_ndjson', full_scan=True)
+def _api_tasks_ndjson(targets, n):
+    return [{'path': '/api/tasks', 'query_string': {'format': 'ndjson'}}] * n
+
+
+@scenario('api_tasks_page')
+def _api_tasks_page(targets, n):
+    return [{'path': '/api/tasks', 'query_string': {'limit': 50, 'after': targets.cursor}}] * n
+
+
+@scenario('api_tasks_not_modified')
+def _api_tasks_not_modified(targets, n):
+    with targets.app.test_client() as client:
+        etag = client.get('/api/tasks', query_string={'limit': 50}).headers['ETag']
+    return [{'path': '/api/tasks', 'query_string': {'limit': 50},
+             'headers': {'If-None-Match': etag}}] * n
+
+
+@scenario('api_task_changes')
+def _api_task_changes(targets, n):
+    return [{'path': '/api/tasks/changes', 'query_string': {'since': max(targets.version() - 10, 0)}}] * n
+
+
+@scenario('api_tasks_stats')
+def _api_tasks_stats(targets, n):
+    return [{'path': '/api/tasks/stats'}] * n
+
+
+@scenario('api_tasks_search')
+def _api_tasks_search(targets, n):
+    return [{'path': '/api/tasks/search', 'query_string': {'q': word}}
+            for word in itertools.islice(itertools.cycle(['report', 'review budget', 'deplo']), n)]
+
+
+@scenario('api_task_events', stream=True)
+def _api_task_events(targets, n):
+    return [{'path': '/api/tasks/events',
+             'query_string': {'last_event_id': max(targets.event_id() - 50, 0)}}] * n
+
+
+@scenario('api_tasks_batch')
+def _api_tasks_batch(targets, n):
+    return [{'path': '/api/tasks/batch', 'method': 'POST',
+             'json': [{'op': 'update', 'id': task_id, 'completed': bool(i % 2)}
+                      for task_id in targets.sample(10)]}
+            for i in range(n)]
+
+
+@scenario('api_task_get')
+def _api_task_get(targets, n):
+    return [{'path': f'/api/task/{task_id}'} for task_id in targets.sample(n)]
+
+
+@scenario('api_task_put')
+def _api_task_put(targets, n):
+    return [{'path': f'/api/task/{task_id}', 'method': 'PUT', 'json': {'completed': bool(i % 2)}}
+            for i, task_id in enumerate(targets.sample(n))]
+
+
+@scenario('api_task_delete')
+def _api_task_delete(targets, n):
+    return [{'path': f'/api/task/{task_id}', 'method': 'DELETE'} for task_id in targets.fresh_ids(n)]
+
+
+@scenario('api_cache_stats')
+def _api_cache_stats(targets, n):
+    return [{'path': '/api/cache/stats'}] * n
+
+
+def call(app, spec, stream=False):
+    """Run one request through the WSGI app; returns (seconds, status)."""
+    environ = EnvironBuilder(**spec).get_environ()
+    status = []
+
+    def start_response(status_line, headers, exc_info=None):
+        status.append(int(status_line[:3]))
+
+    started = time.perf_counter()
+    body = app(environ, start_response)
+    try:
+        for _ in body:
+            if stream:
+                break
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return time.perf_counter() - started, status[0]
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_load(app, specs, threads, stream=False):
+    latencies = [0.0] * len(specs)
+    statuses = [0] * len(specs)
+    counter = itertools.count()
+
+    def worker():
+        for i in counter:
+            if i >= len(specs):
+                return
+            latencies[i], statuses[i] = call(app, specs[i], stream)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(specs),
+        'errors': sum(status >= 400 for status in statuses),
+        'throughput': len(specs) / elapsed,
+        'mean_ms': sum(latencies) / len(latencies) * 1000,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def seeded_database(data_dir, rows, reseed=False):
+    path = os.path.join(data_dir, f'tasks-{rows}.db')
+    if reseed or not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        print(f'Seeding {rows} tasks into {path} ...')
+        build_database(path, rows)
+    return path
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Return a description of each scenario that regressed against ``baseline``."""
+    regressions = []
+    for key, current in results['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(key)
+        if base is None:
+            continue
+        if current['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {current['p95_ms']:.2f} ms, "
+                               f"baseline {base['p95_ms']:.2f} ms")
+        if current['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{key}: {current['throughput']:.0f} req/s, "
+                               f"baseline {base['throughput']:.0f} req/s")
+        if current['errors'] > base['errors']:
+            regressions.append(f"{key}: {current['errors']} errors, baseline {base['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=parse_size, default='10k',
+                        help='seeded row count, or one of: ' + ', '.join(SIZES))
+    parser.add_argument('--threads', default='1,8',
+                        help='comma-separated thread counts to run each scenario with')
+    parser.add_argument('--requests', type=int, default=500, help='requests per scenario run')
+    parser.add_argument('--warmup', type=int, default=20, help='untimed requests first')
+    parser.add_argument('--scenarios', help='comma-separated subset of: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--include-full-scans', action='store_true',
+                        help='run whole-table scenarios on databases over 100k rows')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='where seeded databases are kept')
+    parser.add_argument('--reseed', action='store_true')
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--baseline', help='results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative slowdown before flagging a regression')
+    args = parser.parse_args()
+
+    thread_counts = [int(count) for count in args.threads.split(',')]
+    names = args.scenarios.split(',') if args.scenarios else list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error('unknown scenarios: ' + ', '.join(sorted(unknown)))
+    selected = [SCENARIOS[name] for name in names
+                if not (SCENARIOS[name].full_scan and args.size > 100_000
+                        and not args.include_full_scans)]
+
+    source = seeded_database(args.data_dir, args.size, args.reseed)
+    results = {
+        'meta': {
+            'rows': args.size,
+            'requests': args.requests,
+            'threads': thread_counts,
+            'started_at': datetime.utcnow().isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+        },
+        'scenarios': {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        shutil.copyfile(source, path)
+
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+            WTF_CSRF_ENABLED = False
+            COUNTER_RECONCILE_INTERVAL = 0
+
+        app = create_app(BenchConfig)
+        targets = Targets(app)
+        print(f"{args.size} rows, {args.requests} requests per run, revision {results['meta']['revision']}")
+        print(f"  {'scenario':26} {'threads':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+              f"{'p99 ms':>9} {'errors':>6}")
+        for item in selected:
+            for threads in thread_counts:
+                run_load(app, item.build(targets, args.warmup), threads, item.stream)
+                stats = run_load(app, item.build(targets, args.requests), threads, item.stream)
+                results['scenarios'][f'{item.name}@{threads}'] = stats
+                print(f"  {item.name:26} {threads:7} {stats['throughput']:9.0f} "
+                      f"{stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} {stats['p99_ms']:9.2f} "
+                      f"{stats['errors']:6}")
+
+        with app.app_context():
+            db.engine.dispose()
+        app.extensions['read_engine'].dispose()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['meta']['rows'] != args.size:
+            print(f"Warning: baseline was measured on {baseline['meta']['rows']} rows", file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f'{len(regressions)} regressions against {args.baseline}:', file=sys.stderr)
+            for regression in regressions:
+                print('  ' + regression, file=sys.stderr)
+            sys.exit(1)
+        print(f'No regressions against {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Compare the ORM and column-projection serializers behind the read APIs.
+
+Seeds a throwaway SQLite database, then checks that the Core ``select()``
+path produces byte-identical output to the old ``Task.query`` +
+``to_dict()`` + ``jsonify`` path for /api/tasks and /api/task/<id>, and
+times both (with and without orjson when it is installed).
+
+    python benchmarks/bench_serialization.py --rows 20000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import jsonify
+from sqlalchemy import insert
+
+from app import create_app, db
+from app.models import Task
+from app.routes import TASK_ORDER
+from app.serializers import json_bytes, orjson, select_tasks, task_row_dict
+from config import Config
+
+# Mostly ASCII, with enough escapes and non-ASCII text to exercise every
+# encoder path.
+SAMPLE_TEXT = [
+    'Plain ASCII title',
+    'Write the quarterly report',
+    'Review pull request #42',
+    'Quotes "and" back\\slashes',
+    'Tabs\tand\nnewlines',
+] * 4 + [
+    'Control \x01 and DEL \x7f characters',
+    'Café crème brûlée',
+    '日本語のタスク',
+    'Emoji \U0001f680 launch',
+]
+
+
+def seed(rows, ascii_only=False):
+    texts = [text for text in SAMPLE_TEXT if text.isascii()] if ascii_only else SAMPLE_TEXT
+    start = datetime(2024, 1, 1)
+    batch = []
+    for i in range(rows):
+        created = start + timedelta(seconds=i * 7)
+        batch.append({
+            'title': random.choice(texts)[:100],
+            'description': None if i % 5 == 0 else random.choice(texts) * 3,
+            'completed': i % 3 == 0,
+            'created_at': created,
+            'updated_at': created + timedelta(minutes=i % 90),
+        })
+        if len(batch) == 5000:
+            db.session.execute(insert(Task), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Task), batch)
+    db.session.commit()
+
+
+def orm_list():
+    tasks = Task.query.order_by(*[c.desc() for c in TASK_ORDER]).all()
+    body = jsonify([task.to_dict() for task in tasks]).get_data()
+    db.session.expunge_all()
+    return body
+
+
+def core_list():
+    rows = db.session.execute(select_tasks(db.session).order_by(*[c.desc() for c in TASK_ORDER]))
+    return json_bytes([task_row_dict(row) for row in rows])
+
+
+def orm_detail(ids):
+    bodies = [jsonify(db.session.get(Task, task_id).to_dict()).get_data() for task_id in ids]
+    db.session.expunge_all()
+    return bodies
+
+
+def core_detail(ids):
+    return [json_bytes(task_row_dict(db.session.execute(select_tasks(db.session).where(Task.id == task_id)).one()))
+            for task_id in ids]
+
+
+def best_of(repeat, func, *args):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--details', type=int, default=2000, help='detail lookups per run')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--ascii-only', action='store_true',
+                        help='seed only ASCII text (best case for orjson)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            COUNTER_RECONCILE_INTERVAL = 0
+
+        app = create_app(BenchConfig)
+        with app.test_request_context():
+            seed(args.rows, args.ascii_only)
+            ids = random.sample(range(1, args.rows + 1), min(args.details, args.rows))
+
+            encoders = [False, True] if orjson is not None else [False]
+            identical = True
+            print(f'{args.rows} rows, {len(ids)} detail lookups, best of {args.repeat}')
+            for fast in encoders:
+                app.config['JSON_FAST_ENCODER'] = fast
+                label = 'orjson' if fast else 'stdlib json'
+
+                orm_time, orm_body = best_of(args.repeat, orm_list)
+                core_time, core_body = best_of(args.repeat, core_list)
+                same = orm_body == core_body
+                identical &= same
+                print(f'  /api/tasks      [{label:11}] ORM {orm_time * 1000:8.1f} ms  '
+                      f'Core {core_time * 1000:8.1f} ms  x{orm_time / core_time:4.2f}  '
+                      f'identical={same}')
+
+                orm_time, orm_bodies = best_of(args.repeat, orm_detail, ids)
+                core_time, core_bodies = best_of(args.repeat, core_detail, ids)
+                same = orm_bodies == core_bodies
+                identical &= same
+                print(f'  /api/task/<id>  [{label:11}] ORM {orm_time * 1000:8.1f} ms  '
+                      f'Core {core_time * 1000:8.1f} ms  x{orm_time / core_time:4.2f}  '
+                      f'identical={same}')
+
+            db.engine.dispose()
+
+    if not identical:
+        print('Output differs from the ORM + jsonify path', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
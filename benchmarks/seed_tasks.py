@@ -0,0 +1,132 @@
+"""Build a SQLite database of synthetic tasks for benchmarking.
+
+    python benchmarks/seed_tasks.py --rows 100k --output /tmp/tasks-100k.db
+
+Rows are deterministic for a given ``--seed``. The counters, version and
+full-text index are brought up to date, so the result behaves like a real
+database that reached that size through the app.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, text
+
+from app import create_app, db
+from app.changes import adjust_counters, bump_version
+from app.models import Task
+from app.search import FTS_DDL, FTS_EXISTS
+from config import Config
+
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+VERBS = ['Write', 'Review', 'Fix', 'Plan', 'Update', 'Test', 'Deploy', 'Refactor',
+         'Document', 'Call', 'Email', 'Schedule', 'Prepare', 'Clean up', 'Draft']
+NOUNS = ['report', 'release notes', 'login page', 'budget', 'database backup',
+         'quarterly review', 'onboarding guide', 'pull request', 'invoice', 'roadmap',
+         'test plan', 'customer feedback', 'design mockups', 'API docs', 'slides']
+DETAILS = ['before the team sync', 'for the Berlin office', 'with the new template',
+           'and share the summary', 'after the migration', 'for Q3', 'in the staging env',
+           'ahead of the launch', 'using last week\'s numbers', 'with Ana and Luis']
+
+# Creation times are spread over the year before this.
+EPOCH = datetime(2025, 1, 1)
+
+
+def parse_size(value):
+    value = value.lower()
+    if value in SIZES:
+        return SIZES[value]
+    return int(value.replace('_', ''))
+
+
+def generate_rows(rows, seed=0):
+    rng = random.Random(seed)
+    span = 365 * 24 * 3600
+    for i in range(rows):
+        created = EPOCH - timedelta(seconds=span * (rows - i) / rows, microseconds=rng.randrange(10 ** 6))
+        title = f'{rng.choice(VERBS)} {rng.choice(NOUNS)}'
+        if rng.random() < 0.4:
+            title += f' {rng.choice(DETAILS)}'
+        description = None
+        if rng.random() < 0.7:
+            description = ' '.join(
+                f'{rng.choice(VERBS)} the {rng.choice(NOUNS)} {rng.choice(DETAILS)}.'
+                for _ in range(rng.randint(1, 4))
+            )
+        yield {
+            'title': title[:100],
+            'description': description,
+            'completed': rng.random() < 0.35,
+            'created_at': created,
+            'updated_at': created + timedelta(minutes=rng.randrange(60 * 24 * 30)),
+        }
+
+
+def seed_tasks(session, rows, seed=0, chunk_size=10_000):
+    """Bulk insert ``rows`` synthetic tasks and fix up the derived state."""
+    fts = session.execute(FTS_EXISTS).first() is not None
+    if fts:
+        # One rebuild at the end is several times faster than the per-row trigger
+        session.execute(text('DROP TRIGGER task_fts_insert'))
+
+    chunk = []
+    completed = 0
+    for row in generate_rows(rows, seed):
+        chunk.append(row)
+        completed += row['completed']
+        if len(chunk) == chunk_size:
+            session.execute(insert(Task), chunk)
+            chunk = []
+    if chunk:
+        session.execute(insert(Task), chunk)
+
+    if fts:
+        session.execute(text("INSERT INTO task_fts(task_fts) VALUES ('rebuild')"))
+        for statement in FTS_DDL:
+            session.execute(text(statement))
+    bump_version(session)
+    adjust_counters(session, total=rows, completed=completed)
+    session.commit()
+
+
+def build_database(path, rows, seed=0):
+    """Create a database file at ``path`` holding ``rows`` synthetic tasks."""
+    if os.path.exists(path):
+        os.remove(path)
+
+    class SeedConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.abspath(path)}'
+        COUNTER_RECONCILE_INTERVAL = 0
+        SQLITE_CHECKPOINT_INTERVAL = 0
+
+    app = create_app(SeedConfig)
+    with app.app_context():
+        seed_tasks(db.session, rows, seed)
+        with db.engine.connect() as conn:
+            # Fold the WAL into the main file so the database is one file to copy
+            conn.exec_driver_sql('PRAGMA wal_checkpoint(TRUNCATE)')
+        db.engine.dispose()
+    app.extensions['read_engine'].dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=parse_size, default='10k',
+                        help='row count, or one of: ' + ', '.join(SIZES))
+    parser.add_argument('--output', required=True, help='database file to create')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    build_database(args.output, args.rows, args.seed)
+    print(f'Seeded {args.rows} tasks into {args.output} in {time.perf_counter() - started:.1f} s')
+
+
+if __name__ == '__main__':
+    main()
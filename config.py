@@ -6,8 +6,127 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///tasks.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # 'api' for workers that only serve the JSON API: page-only extensions
+    # and the template cache are not set up
+    APP_ROLE = os.environ.get('APP_ROLE') or 'web'
+    # Startup skips the schema check while the database records the current
+    # schema fingerprint ('auto'); 'always' checks on every boot
+    SCHEMA_CHECK = os.environ.get('SCHEMA_CHECK') or 'auto'
+    # wsgi.py compiles templates and primes the caches before forking workers
+    WARM_UP = os.environ.get('WARM_UP', '1') == '1'
+    
+    # Read-only handlers use their own engine and pool: this replica URI, or
+    # by default the SQLite database file opened read-only
+    READ_ROUTING = True
+    SQLALCHEMY_READ_DATABASE_URI = os.environ.get('READ_DATABASE_URL')
+    SQLALCHEMY_READ_ENGINE_OPTIONS = {}
+    
+    # SQLite connection pragmas: a profile from app.storage.SQLITE_PROFILES,
+    # plus per-pragma overrides in SQLITE_PRAGMAS
+    SQLITE_STORAGE_PROFILE = os.environ.get('SQLITE_STORAGE_PROFILE') or 'wal'
+    SQLITE_PRAGMAS = {}
+    # Seconds between background WAL checkpoints in each worker; 0 disables
+    SQLITE_CHECKPOINT_INTERVAL = 30
+    SQLITE_CHECKPOINT_MODE = 'PASSIVE'
+    # Write views re-run this many times when SQLite reports the database busy
+    SQLITE_BUSY_RETRIES = 3
+    SQLITE_BUSY_RETRY_DELAY = 0.05
+    
+    # Group commit: toggles and API updates go to one writer thread per
+    # process, which commits everything arriving within the window together
+    WRITE_BEHIND_ENABLED = os.environ.get('WRITE_BEHIND_ENABLED') == '1'
+    WRITE_BEHIND_WINDOW_MS = 2
+    WRITE_BEHIND_MAX_BATCH = 64
+    # Seconds a request waits for its batch to commit
+    WRITE_BEHIND_TIMEOUT = 30
+    
+    # Per-request SQL, template, serialization and total timings, sent as a
+    # Server-Timing header and aggregated into histograms at /metrics
+    METRICS_ENABLED = True
+    METRICS_SERVER_TIMING = True
+    
+    # Query diagnostics for development and tests: log statements slower than
+    # the threshold with parameters and plan, and flag requests that repeat
+    # one statement shape N_PLUS_ONE_THRESHOLD times (strict mode fails them)
+    QUERY_DIAGNOSTICS = os.environ.get('QUERY_DIAGNOSTICS') == '1'
+    QUERY_DIAGNOSTICS_STRICT = os.environ.get('QUERY_DIAGNOSTICS_STRICT') == '1'
+    SLOW_QUERY_THRESHOLD_MS = 100
+    N_PLUS_ONE_THRESHOLD = 5
+    
     # Session configuration
     PERMANENT_SESSION_LIFETIME = timedelta(hours=1)
     
     # Pagination
     TASKS_PER_PAGE = 10
+    API_MAX_PAGE_SIZE = 100
+    
+    # Encode API JSON with orjson when it is installed. Output stays
+    # byte-identical to jsonify; non-ASCII payloads use the stdlib encoder.
+    JSON_FAST_ENCODER = True
+    
+    # In-process LRU cache of encoded task JSON (see /api/cache/stats)
+    JSON_CACHE_MAX_ENTRIES = 10000
+    JSON_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    
+    # Rendered task-list fragments for the index page, keyed by table version
+    FRAGMENT_CACHE_MAX_ENTRIES = 1000
+    FRAGMENT_CACHE_MAX_BYTES = 16 * 1024 * 1024
+    
+    # Fingerprinted static assets (see 'flask tasks build-assets'); the
+    # directory defaults to instance/assets
+    ASSETS_BUILD_DIR = None
+    
+    # gzip for compressible responses of at least GZIP_MIN_SIZE bytes
+    GZIP_ENABLED = True
+    GZIP_LEVEL = 6
+    GZIP_MIN_SIZE = 1024
+    GZIP_CACHE_MAX_ENTRIES = 1000
+    GZIP_CACHE_MAX_BYTES = 32 * 1024 * 1024
+    
+    # Compiled Jinja templates cached on disk and shared between workers;
+    # the directory defaults to instance/jinja-cache
+    JINJA_BYTECODE_CACHE = True
+    JINJA_BYTECODE_CACHE_DIR = None
+    
+    # Seconds between checks of the maintained task counters against real
+    # counts in each worker; 0 disables (see 'flask tasks reconcile-counters')
+    COUNTER_RECONCILE_INTERVAL = 3600
+    
+    # ASGI front end (asgi.py): API reads use an async driver when one is
+    # installed; the WSGI app and any blocking queries run on a pool of
+    # ASYNC_API_THREADS threads
+    ASYNC_DATABASE = True
+    ASYNC_READ_DATABASE_URI = os.environ.get('ASYNC_READ_DATABASE_URL')
+    ASYNC_API_THREADS = 16
+    
+    # Rows fetched and flushed per chunk by the streaming /api/tasks modes
+    API_STREAM_BATCH_SIZE = 500
+    
+    # Operations accepted by one /api/tasks/batch request
+    API_MAX_BATCH_SIZE = 1000
+    
+    # Bulk import/export ('flask tasks import/export', /api/tasks/import and
+    # /api/tasks/export): rows per insert transaction, rejected rows listed
+    # in the result, and rows per exported chunk
+    IMPORT_CHUNK_SIZE = 5000
+    IMPORT_MAX_REPORTED_ERRORS = 100
+    EXPORT_BATCH_SIZE = 1000
+    
+    # Delta sync (/api/tasks/changes): clients further behind than this many
+    # changes get a full snapshot instead
+    SYNC_MAX_CHANGES = 1000
+    TOMBSTONE_RETENTION_DAYS = 30
+    
+    # Tasks completed and untouched for ARCHIVE_AFTER_DAYS move to the
+    # task_archive table, ARCHIVE_BATCH_SIZE per transaction. Each worker runs
+    # the mover every ARCHIVE_INTERVAL seconds; 0 disables it (see 'flask
+    # tasks archive')
+    ARCHIVE_AFTER_DAYS = 90
+    ARCHIVE_BATCH_SIZE = 1000
+    ARCHIVE_INTERVAL = 3600
+    
+    # Server-Sent Events (/api/tasks/events). Streams poll the event table
+    # this often (in seconds) for commits made by other worker processes.
+    SSE_POLL_INTERVAL = 1.0
+    SSE_HEARTBEAT_INTERVAL = 15
+    TASK_EVENT_RETENTION_MINUTES = 60
@@ -0,0 +1,53 @@
+"""Gunicorn settings. Start the server with ``gunicorn`` from this directory.
+
+Every value can be overridden on the command line or via GUNICORN_CMD_ARGS;
+the worker and thread counts also follow WEB_CONCURRENCY and
+GUNICORN_THREADS.
+"""
+import os
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+
+def _cpu_count():
+    # CPUs this process may run on, which is less than os.cpu_count() under
+    # taskset or a container cpuset
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# One worker process per core serves the CPU-bound work (rendering, JSON).
+# Threads cover requests waiting on SQLite locks and the long-lived
+# /api/tasks/events streams, which each hold a thread.
+workers = int(os.environ.get('WEB_CONCURRENCY', _cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# Build and warm up the app once in the master, so workers fork with the
+# code, compiled templates and primed caches already in memory and a
+# respawned worker is serving straight away
+preload_app = True
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then; staggered so they do not restart together
+max_requests = 10000
+max_requests_jitter = 1000
+# Worker heartbeats go to tmpfs instead of a possibly slow disk
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def post_fork(server, worker):
+    # warm_up() closed the master's pools before the fork, but a pool
+    # object must never be shared: forget anything inherited without
+    # closing the parent's sockets. Background jobs and the write queue
+    # notice the new pid and start their own threads.
+    if server.cfg.preload_app:
+        from app.server import dispose_engines
+        from wsgi import app
+
+        dispose_engines(app, close=False)
@@ -5,106 +5,423 @@ document.addEventListener('DOMContentLoaded', function() {
             loadTasks();
         });
     }
+
+    subscribeToTaskEvents();
 });
 
+// The page starts with the server-rendered first page. It goes live on
+// Refresh or on the first change pushed over SSE: from then on tasks are
+// fetched a page at a time from /api/tasks as the list is scrolled, only the
+// rows in view are in the DOM, and each row is keyed by task id and patched
+// in place when its task changes.
+const PAGE_SIZE = 50;
+// Rows have a fixed height so the visible window is simple arithmetic
+const ROW_HEIGHT = 112;
+// Rows rendered above and below the viewport
+const OVERSCAN = 6;
+
+// Filter and sort arguments of the page (see app/listing.py), passed on to
+// every /api/tasks request
+const LISTING_ARGS = ['completed', 'created_after', 'created_before', 'updated_after',
+                      'updated_before', 'title_prefix', 'sort', 'order'];
+const listing = new URLSearchParams();
+new URLSearchParams(window.location.search).forEach((value, name) => {
+    if (value && LISTING_ARGS.includes(name)) {
+        listing.set(name, value);
+    }
+});
+
+const taskState = {
+    live: false,
+    // Task ids in display order: the server's, newest first by default
+    order: [],
+    tasks: new Map(),
+    // Cursor of the next page; null once every task is loaded
+    nextCursor: null,
+    loading: null,
+    // Bumped by every reload so responses to older requests are dropped
+    generation: 0,
+    stats: null
+};
+
+const view = {
+    root: null,
+    scroller: null,
+    spacer: null,
+    counts: null,
+    empty: null,
+    // task id -> row element currently in the DOM
+    rows: new Map(),
+    // Detached rows kept for reuse
+    spare: [],
+    renderQueued: false
+};
+
+function fetchJSON(url) {
+    return fetch(url).then(response => {
+        if (!response.ok) {
+            throw new Error('Network response was not ok');
+        }
+        return response.json();
+    });
+}
+
+function tasksUrl(params) {
+    const query = new URLSearchParams(listing);
+    Object.entries(params).forEach(([name, value]) => query.set(name, value));
+    return `/api/tasks?${query}`;
+}
+
 function loadTasks() {
-    fetch('/api/tasks')
-        .then(response => {
-            if (!response.ok) {
-                throw new Error('Network response was not ok');
+    const generation = ++taskState.generation;
+    taskState.loading = Promise.all([
+        fetchJSON(tasksUrl({ limit: PAGE_SIZE })),
+        fetchJSON('/api/tasks/stats')
+    ])
+        .then(([page, stats]) => {
+            if (generation !== taskState.generation) {
+                return;
             }
-            return response.json();
-        })
-        .then(tasks => {
-            renderTasks(tasks);
+            taskState.live = true;
+            taskState.order = [];
+            taskState.tasks.clear();
+            taskState.stats = stats;
+            appendPage(page);
+            mountView();
+            view.scroller.scrollTop = 0;
+            scheduleRender();
         })
         .catch(error => {
             console.error('Error loading tasks:', error);
             showAlert('Error loading tasks. Please try again.', 'danger');
+        })
+        .finally(() => {
+            if (generation === taskState.generation) {
+                taskState.loading = null;
+            }
         });
+    return taskState.loading;
 }
 
-function renderTasks(tasks) {
-    const container = document.getElementById('tasks-container');
-    
-    if (tasks.length === 0) {
-        container.innerHTML = `
-            <div class="alert alert-info">
-                <h4>No tasks found</h4>
-                <p>You don't have any tasks yet. <a href="/add">Add your first task!</a></p>
-            </div>
-        `;
+function loadMore() {
+    if (taskState.loading || taskState.nextCursor === null) {
         return;
     }
-    
-    let html = `
-        <div class="card">
-            <div class="card-header d-flex justify-content-between align-items-center">
-                <h2 class="mb-0">Your Tasks</h2>
-                <span class="badge bg-secondary">${tasks.length} tasks</span>
-            </div>
-            <ul class="list-group list-group-flush">
-    `;
-    
-    tasks.forEach(task => {
-        const createdDate = new Date(task.created_at).toLocaleString();
-        const updatedDate = task.updated_at !== task.created_at ? 
-            ` | Updated: ${new Date(task.updated_at).toLocaleString()}` : '';
-        
-        html += `
-            <li class="list-group-item ${task.completed ? 'completed-task' : ''}">
-                <div class="d-flex justify-content-between align-items-start">
-                    <div>
-                        <h4>${task.title}</h4>
-                        ${task.description ? `<p>${task.description}</p>` : ''}
-                        <small class="text-muted">
-                            Created: ${createdDate}${updatedDate}
-                        </small>
-                    </div>
-                    <div class="d-flex gap-2">
-                        <a href="/toggle/${task.id}" 
-                           class="btn btn-sm ${task.completed ? 'btn-warning' : 'btn-success'}">
-                            ${task.completed ? 'Reopen' : 'Complete'}
-                        </a>
-                        <a href="/edit/${task.id}" class="btn btn-warning btn-sm">Edit</a>
-                        <form method="POST" action="/delete/${task.id}" 
-                              onsubmit="return confirm('Are you sure you want to delete this task?');">
-                            <button type="submit" class="btn btn-danger btn-sm">Delete</button>
-                        </form>
-                    </div>
-                </div>
-            </li>
-        `;
+    const generation = taskState.generation;
+    taskState.loading = fetchJSON(tasksUrl({ limit: PAGE_SIZE, after: taskState.nextCursor }))
+        .then(page => {
+            if (generation === taskState.generation) {
+                appendPage(page);
+                scheduleRender();
+            }
+        })
+        .catch(error => console.error('Error loading more tasks:', error))
+        .finally(() => {
+            if (generation === taskState.generation) {
+                taskState.loading = null;
+            }
+        });
+}
+
+function appendPage(page) {
+    page.tasks.forEach(task => {
+        // A task created while paging may already have arrived over SSE
+        if (!taskState.tasks.has(task.id)) {
+            taskState.order.push(task.id);
+        }
+        taskState.tasks.set(task.id, task);
     });
-    
-    html += `
-            </ul>
-        </div>
-    `;
-    
-    container.innerHTML = html;
-    
-    // Re-attach event listener to the new refresh button
-    const newRefreshBtn = document.getElementById('refresh-btn');
-    if (newRefreshBtn) {
-        newRefreshBtn.addEventListener('click', function() {
-            loadTasks();
+    taskState.nextCursor = page.next_cursor;
+}
+
+function subscribeToTaskEvents() {
+    if (!window.EventSource || !document.getElementById('tasks-container')) {
+        return;
+    }
+    // Search results are a fixed answer to a query; leave them alone
+    if (new URLSearchParams(window.location.search).has('q')) {
+        return;
+    }
+
+    const source = new EventSource('/api/tasks/events');
+    ['created', 'updated', 'toggled'].forEach(kind => {
+        source.addEventListener(kind, event => {
+            applyTaskEvent(kind, JSON.parse(event.data).task);
         });
+    });
+    source.addEventListener('deleted', event => {
+        applyTaskEvent('deleted', JSON.parse(event.data).id);
+    });
+    source.addEventListener('reset', () => {
+        if (taskState.live) {
+            loadTasks();
+        }
+    });
+}
+
+function applyTaskEvent(kind, value) {
+    // Until the page is live there is no local state to patch, so load it
+    if (!taskState.live) {
+        if (!taskState.loading) {
+            loadTasks();
+        }
+        return;
+    }
+
+    // Only the default order is patched in place; a change can move a task
+    // into, out of or across a filtered or re-sorted list, so that reloads
+    if (listing.toString()) {
+        scheduleReload();
+        return;
+    }
+
+    if (kind === 'deleted') {
+        removeTask(value);
+    } else if (taskState.tasks.has(value.id)) {
+        taskState.tasks.set(value.id, value);
+    } else if (kind === 'created') {
+        insertTask(value);
+    }
+    refreshStats();
+    scheduleRender();
+}
+
+function compareTasks(a, b) {
+    return b.created_at.localeCompare(a.created_at) || b.id - a.id;
+}
+
+function insertTask(task) {
+    const order = taskState.order;
+    let low = 0;
+    let high = order.length;
+    while (low < high) {
+        const mid = (low + high) >> 1;
+        if (compareTasks(taskState.tasks.get(order[mid]), task) < 0) {
+            low = mid + 1;
+        } else {
+            high = mid;
+        }
+    }
+    // Past the loaded pages it arrives with a later page instead
+    if (low === order.length && taskState.nextCursor !== null) {
+        return;
+    }
+    order.splice(low, 0, task.id);
+    taskState.tasks.set(task.id, task);
+}
+
+function removeTask(id) {
+    if (!taskState.tasks.delete(id)) {
+        return;
+    }
+    taskState.order.splice(taskState.order.indexOf(id), 1);
+    const row = view.rows.get(id);
+    if (row) {
+        view.rows.delete(id);
+        releaseRow(row);
+    }
+}
+
+let reloadTimer = null;
+
+function scheduleReload() {
+    // One reload for a burst of events
+    clearTimeout(reloadTimer);
+    reloadTimer = setTimeout(loadTasks, 250);
+}
+
+let statsTimer = null;
+
+function refreshStats() {
+    // One request for a burst of events
+    clearTimeout(statsTimer);
+    statsTimer = setTimeout(() => {
+        fetchJSON('/api/tasks/stats')
+            .then(stats => {
+                taskState.stats = stats;
+                scheduleRender();
+            })
+            .catch(error => console.error('Error loading task stats:', error));
+    }, 250);
+}
+
+function element(tag, className, text) {
+    const node = document.createElement(tag);
+    if (className) {
+        node.className = className;
+    }
+    if (text !== undefined) {
+        node.textContent = text;
+    }
+    return node;
+}
+
+function mountView() {
+    if (view.root) {
+        return;
+    }
+    const container = document.getElementById('tasks-container');
+
+    const header = element('div', 'card-header d-flex justify-content-between align-items-center');
+    header.append(element('h2', 'mb-0', 'Your Tasks'));
+    view.counts = {
+        open: element('span', 'badge bg-success'),
+        completed: element('span', 'badge bg-light text-dark'),
+        total: element('span', 'badge bg-secondary')
+    };
+    const badges = element('div');
+    badges.append(view.counts.open, ' ', view.counts.completed, ' ', view.counts.total);
+    header.append(badges);
+
+    view.scroller = element('div', 'virtual-list');
+    view.spacer = element('ul', 'list-group list-group-flush virtual-spacer');
+    view.scroller.append(view.spacer);
+    view.scroller.addEventListener('scroll', scheduleRender, { passive: true });
+
+    view.root = element('div', 'card');
+    view.root.append(header, view.scroller);
+
+    view.empty = element('div', 'alert alert-info');
+    view.empty.append(element('h4', null, 'No tasks found'));
+    const hint = element('p', null, "You don't have any tasks yet. ");
+    const addLink = element('a', null, 'Add your first task!');
+    addLink.href = '/add';
+    hint.append(addLink);
+    view.empty.append(hint);
+
+    container.replaceChildren(view.root, view.empty);
+    window.addEventListener('resize', scheduleRender);
+}
+
+function scheduleRender() {
+    if (view.renderQueued || !view.root) {
+        return;
+    }
+    view.renderQueued = true;
+    requestAnimationFrame(() => {
+        view.renderQueued = false;
+        renderTasks();
+    });
+}
+
+function renderTasks() {
+    const order = taskState.order;
+    const stats = taskState.stats;
+
+    view.root.hidden = order.length === 0;
+    view.empty.hidden = order.length !== 0;
+    if (stats) {
+        view.counts.open.textContent = `${stats.open} open`;
+        view.counts.completed.textContent = `${stats.completed} completed`;
+        view.counts.total.textContent = `${stats.total} tasks`;
+    }
+    view.spacer.style.height = `${order.length * ROW_HEIGHT}px`;
+
+    const top = view.scroller.scrollTop;
+    const first = Math.max(0, Math.floor(top / ROW_HEIGHT) - OVERSCAN);
+    const last = Math.min(order.length, Math.ceil((top + view.scroller.clientHeight) / ROW_HEIGHT) + OVERSCAN);
+
+    const visible = new Set(order.slice(first, last));
+    view.rows.forEach((row, id) => {
+        if (!visible.has(id)) {
+            view.rows.delete(id);
+            releaseRow(row);
+        }
+    });
+
+    for (let index = first; index < last; index++) {
+        const task = taskState.tasks.get(order[index]);
+        let row = view.rows.get(task.id);
+        if (!row) {
+            row = view.spare.pop() || createRow();
+            view.rows.set(task.id, row);
+            view.spacer.append(row);
+        }
+        patchRow(row, task);
+        row.style.transform = `translateY(${index * ROW_HEIGHT}px)`;
+    }
+
+    if (last >= order.length - OVERSCAN) {
+        loadMore();
     }
 }
 
+function createRow() {
+    const row = element('li', 'list-group-item virtual-row');
+    row.style.height = `${ROW_HEIGHT}px`;
+
+    const layout = element('div', 'd-flex justify-content-between align-items-start');
+    const text = element('div', 'task-text');
+    text.append(element('h4'), element('p'), element('small', 'text-muted'));
+
+    const actions = element('div', 'd-flex gap-2');
+    const toggle = element('a', 'btn btn-sm');
+    const edit = element('a', 'btn btn-warning btn-sm', 'Edit');
+    const form = element('form');
+    form.method = 'POST';
+    form.addEventListener('submit', event => {
+        if (!confirm('Are you sure you want to delete this task?')) {
+            event.preventDefault();
+        }
+    });
+    const remove = element('button', 'btn btn-danger btn-sm', 'Delete');
+    remove.type = 'submit';
+    form.append(remove);
+    actions.append(toggle, edit, form);
+
+    layout.append(text, actions);
+    row.append(layout);
+    row.parts = { title: text.children[0], description: text.children[1], dates: text.children[2],
+                  toggle, edit, form };
+    return row;
+}
+
+function releaseRow(row) {
+    row.remove();
+    row.signature = null;
+    view.spare.push(row);
+}
+
+function patchRow(row, task) {
+    // Only touch the DOM when something shown in the row changed
+    const signature = `${task.id}|${task.updated_at}|${task.completed}|${task.title}|${task.description}`;
+    if (row.signature === signature) {
+        return;
+    }
+    row.signature = signature;
+    row.dataset.taskId = task.id;
+
+    const parts = row.parts;
+    row.classList.toggle('completed-task', task.completed);
+    // textContent never parses markup, so titles and descriptions are shown as typed
+    parts.title.textContent = task.title;
+    parts.description.textContent = task.description || '';
+    parts.description.hidden = !task.description;
+    let dates = `Created: ${new Date(task.created_at).toLocaleString()}`;
+    if (task.updated_at !== task.created_at) {
+        dates += ` | Updated: ${new Date(task.updated_at).toLocaleString()}`;
+    }
+    parts.dates.textContent = dates;
+
+    parts.toggle.href = `/toggle/${task.id}`;
+    parts.toggle.className = `btn btn-sm ${task.completed ? 'btn-warning' : 'btn-success'}`;
+    parts.toggle.textContent = task.completed ? 'Reopen' : 'Complete';
+    parts.edit.href = `/edit/${task.id}`;
+    parts.form.action = `/delete/${task.id}`;
+}
+
 function showAlert(message, type) {
-    const alertDiv = document.createElement('div');
-    alertDiv.className = `alert alert-${type} alert-dismissible fade show`;
+    const alertDiv = element('div', `alert alert-${type} alert-dismissible fade show`, message);
     alertDiv.setAttribute('role', 'alert');
-    alertDiv.innerHTML = `
-        ${message}
-        <button type="button" class="btn-close" data-bs-dismiss="alert" aria-label="Close"></button>
-    `;
-    
+    const close = element('button', 'btn-close');
+    close.type = 'button';
+    close.setAttribute('data-bs-dismiss', 'alert');
+    close.setAttribute('aria-label', 'Close');
+    alertDiv.append(close);
+
     const container = document.querySelector('.container');
     container.insertBefore(alertDiv, container.firstChild);
-    
+
     // Auto-remove after 5 seconds
     setTimeout(() => {
         alertDiv.remove();
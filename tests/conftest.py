@@ -1,13 +1,24 @@
+import os
 import pytest
 import subprocess
 import time
 import requests
 from playwright.sync_api import sync_playwright
 
+def pytest_addoption(parser):
+    parser.addoption(
+        "--fail-on-n-plus-one", action="store_true",
+        help="run the app with strict query diagnostics, so requests that repeat a query fail"
+    )
+
 @pytest.fixture(scope="session")
-def flask_app():
+def flask_app(request):
+    env = dict(os.environ)
+    if request.config.getoption("--fail-on-n-plus-one"):
+        env.update(QUERY_DIAGNOSTICS="1", QUERY_DIAGNOSTICS_STRICT="1")
+    
     # Start the Flask app
-    process = subprocess.Popen(["python", "run.py"])
+    process = subprocess.Popen(["python", "run.py"], env=env)
     
     # Wait for the app to start
     time.sleep(5)
@@ -37,6 +48,22 @@ def flask_app():
     process.terminate()
     process.wait()
 
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    # In-process app on an empty database of its own, for tests that look
+    # at the statements the app runs rather than at responses
+    from app import create_app
+    from config import Config
+    
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path_factory.mktemp('db') / 'tasks.db'}"
+        SQLALCHEMY_READ_DATABASE_URI = None
+        ARCHIVE_INTERVAL = 0
+        COUNTER_RECONCILE_INTERVAL = 0
+        WTF_CSRF_ENABLED = False
+    
+    return create_app(TestConfig)
+
 @pytest.fixture
 def browser():
     with sync_playwright() as p:
@@ -1,7 +1,21 @@
+import itertools
+import json
+import re
+import subprocess
+import time
 import pytest
 import requests
 from playwright.sync_api import expect
 
+def csrf_session(base_url="http://localhost:5000"):
+    # The JSON write endpoints are CSRF protected like the forms; borrow the
+    # token from the add form and send it back as a header.
+    session = requests.Session()
+    html = session.get(f"{base_url}/add").text
+    token = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', html).group(1)
+    session.headers["X-CSRFToken"] = token
+    return session
+
 def test_home_page_loads(flask_app, browser):
     page = browser.new_page()
     page.goto("http://localhost:5000")
@@ -511,4 +525,516 @@ def test_form_validation(flask_app, browser):
     else:
         
         pytest.skip("Form validation for long title is not working - form was submitted")
-        return
\ No newline at end of file
+        return
+def test_api_tasks_cursor_pagination(flask_app):
+    full = requests.get("http://localhost:5000/api/tasks").json()
+    
+    seen = []
+    params = {"limit": 3}
+    while True:
+        response = requests.get("http://localhost:5000/api/tasks", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["tasks"]) <= 3
+        seen.extend(task["id"] for task in page["tasks"])
+        if not page["next_cursor"]:
+            break
+        params = {"limit": 3, "after": page["next_cursor"]}
+    
+    assert seen == [task["id"] for task in full]
+    
+    response = requests.get("http://localhost:5000/api/tasks", params={"after": "not-a-cursor"})
+    assert response.status_code == 400
+
+def test_api_tasks_streaming_modes(flask_app):
+    full = requests.get("http://localhost:5000/api/tasks").json()
+    
+    response = requests.get("http://localhost:5000/api/tasks", params={"format": "ndjson"}, stream=True)
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("application/x-ndjson")
+    lines = [line for line in response.iter_lines() if line]
+    assert [json.loads(line) for line in lines] == full
+    
+    response = requests.get("http://localhost:5000/api/tasks", params={"stream": 1})
+    assert response.status_code == 200
+    assert response.json() == full
+
+def test_api_tasks_batch(flask_app):
+    session = csrf_session()
+    
+    response = session.post("http://localhost:5000/api/tasks/batch", json={"operations": [
+        {"op": "create", "title": "Batch Task 1", "description": "first"},
+        {"op": "create", "title": "Batch Task 2", "completed": True}
+    ]})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [r["status"] for r in results] == ["ok", "ok"]
+    first_id, second_id = results[0]["id"], results[1]["id"]
+    
+    response = session.post("http://localhost:5000/api/tasks/batch", json=[
+        {"op": "update", "id": first_id, "completed": True},
+        {"op": "delete", "id": second_id}
+    ])
+    assert response.status_code == 200
+    assert response.json()["results"][0]["task"]["completed"] is True
+    assert requests.get(f"http://localhost:5000/api/task/{second_id}").status_code == 404
+    
+    # One invalid item rejects the whole batch
+    response = session.post("http://localhost:5000/api/tasks/batch", json=[
+        {"op": "delete", "id": first_id},
+        {"op": "create", "title": ""}
+    ])
+    assert response.status_code == 400
+    assert response.json()["results"][0]["errors"] == {"title": ["Title is required"]}
+    assert requests.get(f"http://localhost:5000/api/task/{first_id}").status_code == 200
+    
+    session.post("http://localhost:5000/api/tasks/batch", json=[{"op": "delete", "id": first_id}])
+
+def test_api_tasks_import_export(flask_app):
+    session = csrf_session()
+    
+    body = "\n".join([
+        json.dumps({"title": "Imported Task 1", "description": "from jsonl"}),
+        json.dumps({"title": "Imported Task 2", "completed": True,
+                    "created_at": "2020-01-02T03:04:05"}),
+        json.dumps({"title": ""}),
+        "not json",
+    ]) + "\n"
+    response = session.post("http://localhost:5000/api/tasks/import", data=body.encode(),
+                            headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    result = response.json()
+    assert result["imported"] == 2
+    assert result["rejected"] == 2
+    assert result["errors"] == [
+        {"line": 3, "errors": {"title": ["Title is required"]}},
+        {"line": 4, "errors": {"record": ["Invalid JSON"]}}
+    ]
+    
+    csv_body = "title,description,completed\nImported Task 3,\"with, comma\",yes\n"
+    response = session.post("http://localhost:5000/api/tasks/import", params={"format": "csv"},
+                            data=csv_body.encode())
+    assert response.json()["imported"] == 1
+    
+    response = requests.get("http://localhost:5000/api/tasks/export", params={"format": "jsonl"})
+    assert response.headers["Content-Type"].startswith("application/x-ndjson")
+    exported = {task["title"]: task for task in map(json.loads, response.text.splitlines())}
+    assert exported["Imported Task 1"]["description"] == "from jsonl"
+    assert exported["Imported Task 2"]["completed"] is True
+    assert exported["Imported Task 2"]["created_at"] == "2020-01-02T03:04:05"
+    assert exported["Imported Task 3"]["description"] == "with, comma"
+    
+    response = requests.get("http://localhost:5000/api/tasks/export", params={"format": "csv"})
+    lines = response.text.splitlines()
+    assert lines[0] == "id,title,description,completed,created_at,updated_at"
+    assert f'{exported["Imported Task 3"]["id"]},Imported Task 3,"with, comma",true,' in response.text
+    
+    session.post("http://localhost:5000/api/tasks/batch", json=[
+        {"op": "delete", "id": exported[f"Imported Task {n}"]["id"]} for n in (1, 2, 3)
+    ])
+
+def test_api_tasks_archive(flask_app):
+    session = csrf_session()
+    body = json.dumps({"title": "Archived Task", "completed": True,
+                       "created_at": "2020-01-01T00:00:00", "updated_at": "2020-01-01T00:00:00"})
+    session.post("http://localhost:5000/api/tasks/import", data=body.encode(),
+                 headers={"Content-Type": "application/x-ndjson"})
+    task_id = next(task["id"] for task in requests.get("http://localhost:5000/api/tasks").json()
+                   if task["title"] == "Archived Task")
+    before = requests.get("http://localhost:5000/api/tasks/stats").json()
+    
+    result = subprocess.run(["python", "-m", "flask", "--app", "app", "tasks", "archive", "--days", "365"],
+                            capture_output=True, text=True, check=True)
+    moved = int(re.search(r"Archived (\d+) tasks", result.stdout).group(1))
+    assert moved >= 1
+    
+    # Gone from the hot listing, still there on request
+    assert task_id not in [task["id"] for task in requests.get("http://localhost:5000/api/tasks").json()]
+    archived = requests.get("http://localhost:5000/api/tasks", params={"include_archived": 1}).json()
+    assert task_id in [task["id"] for task in archived]
+    stats = requests.get("http://localhost:5000/api/tasks/stats").json()
+    assert stats["archived"] == before["archived"] + moved
+    assert stats["total"] == before["total"] - moved
+    
+    # Reopening brings it back to the task table
+    session.get(f"http://localhost:5000/toggle/{task_id}")
+    task = requests.get(f"http://localhost:5000/api/task/{task_id}").json()
+    assert task["title"] == "Archived Task"
+    assert task["completed"] is False
+    assert requests.get("http://localhost:5000/api/tasks/stats").json()["archived"] == before["archived"] + moved - 1
+    
+    session.delete(f"http://localhost:5000/api/task/{task_id}")
+
+def test_api_tasks_filters_and_sort(flask_app):
+    session = csrf_session()
+    body = "\n".join(json.dumps(task) for task in [
+        {"title": "Filter Task b", "completed": False, "created_at": "2021-03-01T00:00:00"},
+        {"title": "Filter Task a", "completed": True, "created_at": "2021-03-02T00:00:00"},
+        {"title": "Filter Task c", "completed": False, "created_at": "2021-03-03T00:00:00"},
+    ])
+    session.post("http://localhost:5000/api/tasks/import", data=body.encode(),
+                 headers={"Content-Type": "application/x-ndjson"})
+    
+    def titles(**params):
+        response = requests.get("http://localhost:5000/api/tasks",
+                                params={"title_prefix": "Filter Task ", **params})
+        assert response.status_code == 200
+        return [task["title"] for task in response.json()]
+    
+    assert titles() == ["Filter Task c", "Filter Task a", "Filter Task b"]
+    assert titles(completed=0) == ["Filter Task c", "Filter Task b"]
+    assert titles(completed=1) == ["Filter Task a"]
+    assert titles(sort="title") == ["Filter Task a", "Filter Task b", "Filter Task c"]
+    assert titles(sort="title", order="desc", completed=0) == ["Filter Task c", "Filter Task b"]
+    assert titles(created_after="2021-03-02", created_before="2021-03-03") == ["Filter Task a"]
+    
+    # Paging keeps the filter and the order
+    page = requests.get("http://localhost:5000/api/tasks", params={
+        "title_prefix": "Filter Task ", "sort": "title", "limit": 2}).json()
+    assert [task["title"] for task in page["tasks"]] == ["Filter Task a", "Filter Task b"]
+    page = requests.get("http://localhost:5000/api/tasks", params={
+        "title_prefix": "Filter Task ", "sort": "title", "limit": 2, "after": page["next_cursor"]}).json()
+    assert [task["title"] for task in page["tasks"]] == ["Filter Task c"]
+    
+    response = requests.get("http://localhost:5000/", params={"title_prefix": "Filter Task ", "completed": 0})
+    assert "Filter Task c" in response.text
+    assert "Filter Task a" not in response.text
+    
+    for params in ({"sort": "description"}, {"completed": "maybe"}, {"created_after": "yesterday"}):
+        assert requests.get("http://localhost:5000/api/tasks", params=params).status_code == 400
+    
+    ids = [task["id"] for task in requests.get("http://localhost:5000/api/tasks",
+                                               params={"title_prefix": "Filter Task "}).json()]
+    session.post("http://localhost:5000/api/tasks/batch", json=[{"op": "delete", "id": task_id} for task_id in ids])
+
+def test_task_list_queries_use_indexes(app):
+    # Every filter and sort combination must read task and task_archive
+    # through an index, on the first page and on the pages after it
+    from sqlalchemy import event
+    from app.diagnostics import query_plan
+    
+    client = app.test_client()
+    client.post("/api/tasks/batch", json=[
+        {"op": "create", "title": f"Plan Task {n}", "completed": n % 2 == 0} for n in range(5)
+    ])
+    
+    plans = []
+    table = re.compile(r"\bFROM (task|task_archive)\b")
+    
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and table.search(statement):
+            plans.append((statement, query_plan(cursor.connection, conn.dialect, statement, parameters)))
+    
+    full_scan = re.compile(r"^SCAN (TABLE )?(task|task_archive)\b(?!.*INDEX)")
+    filters = [
+        {"completed": ["", "0", "1"]},
+        {"created_after": ["", "2020-01-01"], "created_before": ["", "2030-01-01"]},
+        {"updated_after": ["", "2020-01-01T12:00:00"], "updated_before": ["", "2030-01-01"]},
+        {"title_prefix": ["", "Plan"]},
+        {"sort": ["created_at", "updated_at", "title"], "order": ["asc", "desc"]},
+        {"include_archived": ["", "1"]},
+    ]
+    names = [name for group in filters for name in group]
+    choices = [values for group in filters for values in group.values()]
+    
+    engine = app.extensions["read_engine"]
+    event.listen(engine, "before_cursor_execute", explain)
+    try:
+        for values in itertools.product(*choices):
+            params = {name: value for name, value in zip(names, values) if value}
+            page = client.get("/api/tasks", query_string={**params, "limit": 2}).get_json()
+            client.get("/api/tasks", query_string={**params, "limit": 2, "after": page["next_cursor"]})
+            client.get("/", query_string=params)
+    finally:
+        event.remove(engine, "before_cursor_execute", explain)
+    
+    assert plans
+    for statement, plan in plans:
+        assert plan, statement
+        assert not [line for line in plan if full_scan.match(line)], (statement, plan)
+
+def test_api_conditional_get(flask_app):
+    session = csrf_session()
+    response = session.post("http://localhost:5000/api/tasks/batch", json=[
+        {"op": "create", "title": "ETag Task"}
+    ])
+    task_id = response.json()["results"][0]["id"]
+    
+    response = requests.get("http://localhost:5000/api/tasks")
+    etag = response.headers["ETag"]
+    assert "Last-Modified" in response.headers
+    response = requests.get("http://localhost:5000/api/tasks", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    
+    response = requests.get(f"http://localhost:5000/api/task/{task_id}")
+    task_etag = response.headers["ETag"]
+    response = requests.get(f"http://localhost:5000/api/task/{task_id}", headers={"If-None-Match": task_etag})
+    assert response.status_code == 304
+    
+    # Any write invalidates the list and the row it touched
+    session.post("http://localhost:5000/api/tasks/batch", json=[
+        {"op": "update", "id": task_id, "completed": True}
+    ])
+    response = requests.get("http://localhost:5000/api/tasks", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    response = requests.get(f"http://localhost:5000/api/task/{task_id}", headers={"If-None-Match": task_etag})
+    assert response.status_code == 200
+    assert response.json()["completed"] is True
+    
+    session.post("http://localhost:5000/api/tasks/batch", json=[{"op": "delete", "id": task_id}])
+
+def test_api_task_changes(flask_app):
+    snapshot = requests.get("http://localhost:5000/api/tasks/changes").json()
+    assert snapshot["full"] is True
+    cursor = snapshot["cursor"]
+    
+    session = csrf_session()
+    response = session.post("http://localhost:5000/api/tasks/batch", json=[
+        {"op": "create", "title": "Sync Task"}
+    ])
+    task_id = response.json()["results"][0]["id"]
+    
+    delta = requests.get("http://localhost:5000/api/tasks/changes", params={"since": cursor}).json()
+    assert delta["full"] is False
+    assert [task["id"] for task in delta["tasks"]] == [task_id]
+    assert delta["deleted"] == []
+    
+    session.post("http://localhost:5000/api/tasks/batch", json=[{"op": "delete", "id": task_id}])
+    
+    delta = requests.get("http://localhost:5000/api/tasks/changes", params={"since": delta["cursor"]}).json()
+    assert delta["tasks"] == []
+    assert delta["deleted"] == [task_id]
+
+def test_api_task_events_stream(flask_app):
+    stream = requests.get("http://localhost:5000/api/tasks/events", stream=True, timeout=10)
+    assert stream.headers["Content-Type"].startswith("text/event-stream")
+    lines = stream.iter_lines(decode_unicode=True)
+    assert next(lines).startswith("retry:")
+    
+    session = csrf_session()
+    response = session.post("http://localhost:5000/api/tasks/batch", json=[
+        {"op": "create", "title": "SSE Task"}
+    ])
+    task_id = response.json()["results"][0]["id"]
+    session.post("http://localhost:5000/api/tasks/batch", json=[{"op": "delete", "id": task_id}])
+    
+    received = []
+    for line in lines:
+        if line.startswith("data:"):
+            received.append(json.loads(line[len("data:"):]))
+            if len(received) == 2:
+                break
+    stream.close()
+    
+    assert received[0]["type"] == "created"
+    assert received[0]["task"]["title"] == "SSE Task"
+    assert received[1] == {"type": "deleted", "id": task_id}
+
+def test_api_tasks_search(flask_app):
+    session = csrf_session()
+    response = session.post("http://localhost:5000/api/tasks/batch", json=[
+        {"op": "create", "title": "Quarterly zebrafish report", "description": "Summarise <findings>"},
+        {"op": "create", "title": "Feed the fish", "description": "Ask about the zebrafish tank"}
+    ])
+    ids = [result["id"] for result in response.json()["results"]]
+    
+    response = requests.get("http://localhost:5000/api/tasks/search", params={"q": "zebrafish"})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    # Title matches rank above description matches
+    assert [result["task"]["id"] for result in results] == ids
+    assert "<mark>zebrafish</mark>" in results[0]["title_highlight"]
+    assert results[0]["description_highlight"] == "Summarise &lt;findings&gt;"
+    
+    # Updates are reflected in the index
+    session.post("http://localhost:5000/api/tasks/batch", json=[
+        {"op": "update", "id": ids[0], "title": "Quarterly report"}
+    ])
+    response = requests.get("http://localhost:5000/api/tasks/search", params={"q": "zebrafish"})
+    assert [result["task"]["id"] for result in response.json()["results"]] == [ids[1]]
+    
+    session.post("http://localhost:5000/api/tasks/batch", json=[
+        {"op": "delete", "id": task_id} for task_id in ids
+    ])
+    response = requests.get("http://localhost:5000/api/tasks/search", params={"q": "zebrafish"})
+    assert response.json()["results"] == []
+
+def test_api_tasks_stats(flask_app):
+    before = requests.get("http://localhost:5000/api/tasks/stats").json()
+    assert before["open"] == before["total"] - before["completed"]
+    
+    session = csrf_session()
+    response = session.post("http://localhost:5000/api/tasks/batch", json=[
+        {"op": "create", "title": "Counted Task"},
+        {"op": "create", "title": "Counted Done Task", "completed": True}
+    ])
+    ids = [result["id"] for result in response.json()["results"]]
+    
+    after = requests.get("http://localhost:5000/api/tasks/stats").json()
+    assert after["total"] == before["total"] + 2
+    assert after["completed"] == before["completed"] + 1
+    
+    session.put(f"http://localhost:5000/api/task/{ids[0]}", json={"completed": True})
+    assert requests.get("http://localhost:5000/api/tasks/stats").json()["completed"] == before["completed"] + 2
+    
+    session.post("http://localhost:5000/api/tasks/batch", json=[
+        {"op": "delete", "id": task_id} for task_id in ids
+    ])
+    assert requests.get("http://localhost:5000/api/tasks/stats").json() == before
+
+def test_api_json_cache(flask_app):
+    session = csrf_session()
+    response = session.post("http://localhost:5000/api/tasks/batch", json=[
+        {"op": "create", "title": "Cached Task"}
+    ])
+    task_id = response.json()["results"][0]["id"]
+    
+    before = requests.get("http://localhost:5000/api/cache/stats").json()
+    first = requests.get(f"http://localhost:5000/api/task/{task_id}")
+    second = requests.get(f"http://localhost:5000/api/task/{task_id}")
+    assert first.content == second.content
+    after = requests.get("http://localhost:5000/api/cache/stats").json()
+    assert after["hits"] == before["hits"] + 1
+    assert after["misses"] == before["misses"] + 1
+    
+    # Writes invalidate the cached bytes
+    session.put(f"http://localhost:5000/api/task/{task_id}", json={"title": "Cached Task v2"})
+    assert requests.get(f"http://localhost:5000/api/task/{task_id}").json()["title"] == "Cached Task v2"
+    
+    session.post("http://localhost:5000/api/tasks/batch", json=[{"op": "delete", "id": task_id}])
+
+def test_api_concurrent_writes(flask_app):
+    from concurrent.futures import ThreadPoolExecutor
+    
+    session = csrf_session()
+    response = session.post("http://localhost:5000/api/tasks/batch", json=[
+        {"op": "create", "title": f"Concurrent Task {i}"} for i in range(8)
+    ])
+    ids = [result["id"] for result in response.json()["results"]]
+    before = requests.get("http://localhost:5000/api/tasks/stats").json()
+    
+    def complete(task_id):
+        return session.put(f"http://localhost:5000/api/task/{task_id}", json={"completed": True}).status_code
+    
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert list(pool.map(complete, ids)) == [200] * 8
+    
+    after = requests.get("http://localhost:5000/api/tasks/stats").json()
+    assert after["completed"] == before["completed"] + 8
+    
+    session.post("http://localhost:5000/api/tasks/batch", json=[
+        {"op": "delete", "id": task_id} for task_id in ids
+    ])
+
+def test_api_reads_see_committed_writes(flask_app):
+    session = csrf_session()
+    response = session.post("http://localhost:5000/api/tasks/batch", json=[
+        {"op": "create", "title": "Routed Task"}
+    ])
+    task_id = response.json()["results"][0]["id"]
+    
+    for completed in (True, False, True):
+        session.put(f"http://localhost:5000/api/task/{task_id}", json={"completed": completed})
+        assert requests.get(f"http://localhost:5000/api/task/{task_id}").json()["completed"] is completed
+        listed = {task["id"]: task for task in requests.get("http://localhost:5000/api/tasks").json()}
+        assert listed[task_id]["completed"] is completed
+    
+    session.delete(f"http://localhost:5000/api/task/{task_id}")
+    assert requests.get(f"http://localhost:5000/api/task/{task_id}").status_code == 404
+
+def test_api_server_timing_and_metrics(flask_app):
+    response = requests.get("http://localhost:5000/api/tasks")
+    timing = response.headers["Server-Timing"]
+    for name in ("db", "render", "serialize", "total"):
+        assert re.search(rf"\b{name};dur=\d+\.\d+", timing)
+    assert re.search(r'desc="[1-9]\d* queries"', timing)
+    
+    response = requests.get("http://localhost:5000/metrics")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain")
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+    assert 'http_request_duration_seconds_count{endpoint="main.api_tasks",method="GET"}' in response.text
+    assert re.search(r'db_queries_per_request_bucket\{endpoint="main.api_tasks",method="GET",le="\+Inf"\} [1-9]', response.text)
+
+def test_index_fragment_cache(flask_app):
+    session = csrf_session()
+    response = session.post("http://localhost:5000/api/tasks/batch", json=[
+        {"op": "create", "title": "Fragment Task"}
+    ])
+    task_id = response.json()["results"][0]["id"]
+    
+    before = requests.get("http://localhost:5000/api/cache/stats?cache=fragments").json()
+    first = requests.get("http://localhost:5000/")
+    second = requests.get("http://localhost:5000/")
+    assert "Fragment Task" in first.text
+    assert first.text == second.text
+    after = requests.get("http://localhost:5000/api/cache/stats?cache=fragments").json()
+    assert after["hits"] == before["hits"] + 1
+    
+    # A write changes the version, so the page is rendered again
+    session.put(f"http://localhost:5000/api/task/{task_id}", json={"title": "Fragment Task v2"})
+    assert "Fragment Task v2" in requests.get("http://localhost:5000/").text
+    
+    session.post("http://localhost:5000/api/tasks/batch", json=[{"op": "delete", "id": task_id}])
+
+def test_static_assets_and_gzip(flask_app):
+    html = requests.get("http://localhost:5000/").text
+    urls = re.findall(r'(?:href|src)="(/assets/[^"]+)"', html)
+    assert any(url.endswith(".css") for url in urls) and any(url.endswith(".js") for url in urls)
+    for url in urls:
+        assert re.search(r"\.[0-9a-f]{12}\.(css|js)$", url)
+        response = requests.get(f"http://localhost:5000{url}")
+        assert response.status_code == 200
+        assert "immutable" in response.headers["Cache-Control"]
+    
+    session = csrf_session()
+    response = session.post("http://localhost:5000/api/tasks/batch", json=[
+        {"op": "create", "title": f"Gzip Task {i}", "description": "x" * 200} for i in range(10)
+    ])
+    ids = [result["id"] for result in response.json()["results"]]
+    
+    response = requests.get("http://localhost:5000/api/tasks", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    plain = requests.get("http://localhost:5000/api/tasks", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+    assert response.json() == plain.json()
+    
+    session.post("http://localhost:5000/api/tasks/batch", json=[{"op": "delete", "id": i} for i in ids])
+
+def test_api_asgi_app(flask_app):
+    pytest.importorskip("uvicorn")
+    base = "http://localhost:5001"
+    process = subprocess.Popen(["python", "-m", "uvicorn", "asgi:app", "--port", "5001", "--log-level", "warning"])
+    try:
+        for _ in range(50):
+            try:
+                requests.get(f"{base}/api/tasks/stats")
+                break
+            except requests.exceptions.ConnectionError:
+                time.sleep(0.2)
+        
+        assert requests.get(f"{base}/api/tasks?limit=5").json() == \
+            requests.get("http://localhost:5000/api/tasks?limit=5").json()
+        assert requests.get(f"{base}/api/task/999999").status_code == 404
+        
+        stream = requests.get(f"{base}/api/tasks/events", stream=True, timeout=10)
+        assert stream.headers["Content-Type"].startswith("text/event-stream")
+        lines = stream.iter_lines(decode_unicode=True)
+        assert next(lines).startswith("retry:")
+        
+        # Writes go through the thread pool and wake the async stream
+        session = csrf_session(base)
+        response = session.post(f"{base}/api/tasks/batch", json=[{"op": "create", "title": "ASGI Task"}])
+        task_id = response.json()["results"][0]["id"]
+        assert requests.get(f"{base}/api/task/{task_id}").json()["title"] == "ASGI Task"
+        for line in lines:
+            if line.startswith("data:"):
+                assert json.loads(line[len("data:"):])["task"]["title"] == "ASGI Task"
+                break
+        stream.close()
+        
+        session.post(f"{base}/api/tasks/batch", json=[{"op": "delete", "id": task_id}])
+    finally:
+        process.terminate()
+        process.wait()
@@ -0,0 +1,12 @@
+"""Production entry point: ``gunicorn`` (settings in gunicorn.conf.py).
+
+With ``preload_app`` this runs once in the master process, before the
+workers are forked.
+"""
+from app import create_app
+from app.server import warm_up
+
+app = create_app()
+
+if app.config['WARM_UP']:
+    warm_up(app)